@@ -779,20 +779,19 @@ class ChatScreen(MDScreen):
             
             # Add messages to UI
             for msg in messages:
-                is_sent = (msg['sender'] == 'ME')
+                is_sent = (msg.sender == 'ME')
                 
                 # Format timestamp
-                dt = datetime.fromtimestamp(msg['timestamp'])
+                dt = datetime.fromtimestamp(msg.timestamp)
                 timestamp = dt.strftime("%H:%M:%S")
                 
-                if msg['message_type'] == 'TEXT':
+                if msg.message_type == 'TEXT':
                     # Text message bubble
-                    bubble = MessageBubble(msg['content'], timestamp, is_sent=is_sent)
+                    bubble = MessageBubble(msg.content, timestamp, is_sent=is_sent)
                     self.messages_list.add_widget(bubble)
-                elif msg['message_type'] == 'FILE':
+                elif msg.message_type == 'FILE':
                     # File bubble
-                    file_path = msg.get('file_path')
-                    bubble = FileBubble(msg['content'], file_path, timestamp, is_sent=is_sent)
+                    bubble = FileBubble(msg.content, msg.file_path, timestamp, is_sent=is_sent)
                     self.messages_list.add_widget(bubble)
             
             # Scroll to bottom
@@ -1376,19 +1375,36 @@ class SettingsScreen(MDScreen):
         print("[PANIC MODE] Initiating data destruction...")
         
         # Stop engine first
+        db_manager = None
         if app.engine:
+            db_manager = app.engine.db_manager
             app.engine.stop()
             time.sleep(1)  # Wait for threads to close file handles
         
-        # Delete database
-        try:
-            if os.path.exists("ghostnet.db"):
-                os.remove("ghostnet.db")
-                print("[PANIC MODE] Database deleted")
-        except Exception as e:
-            print(f"[PANIC MODE] Database deletion error: {e}")
+        # Close the database so the WAL is checkpointed and released
+        db_path = "ghostnet.db"
+        if db_manager:
+            db_path = db_manager.db_path
+            try:
+                db_manager.close()
+            except Exception as e:
+                print(f"[PANIC MODE] Database close error: {e}")
         
-        # Delete encryption key
+        # Delete database, including the WAL and shared-memory side files
+        for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+                    print(f"[PANIC MODE] Deleted {path}")
+            except Exception as e:
+                print(f"[PANIC MODE] Database deletion error ({path}): {e}")
+        
+        # Delete encryption key, wherever it is stored
+        if db_manager:
+            try:
+                db_manager.delete_key()
+            except Exception as e:
+                print(f"[PANIC MODE] Key deletion error: {e}")
         try:
             if os.path.exists("secret.key"):
                 os.remove("secret.key")
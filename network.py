@@ -8,13 +8,18 @@ Features multi-interface detection and automatic network switching.
 """
 
 import socket
+import selectors
 import json
 import threading
 import time
 import os
-from datetime import datetime
+from datetime import datetime, date, timedelta
 from typing import Dict, Callable, Optional
+from cryptography.exceptions import InvalidTag
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 import hashlib
 import base64
 from pathlib import Path
@@ -59,9 +64,13 @@ class GhostEngine:
     TCP_PORT = 37021
     BEACON_INTERVAL = 2  # seconds
     PEER_TIMEOUT = 10    # seconds
+    PRUNE_INTERVAL = 3   # seconds between stale-peer checks
+    MAX_DATAGRAMS_PER_WAKEUP = 64  # beacons drained per readable event
     BUFFER_SIZE = 4096
     HEADER_DELIMITER = b"<HEADER_END>"
     MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB limit
+    NONCE_SIZE = 12                    # AES-GCM nonce length in bytes
+    LEGACY_PREFIX = b"gAAAA"           # Every Fernet token starts with this
     
     def __init__(self, username: str = None, on_message_received: Optional[Callable] = None,
                  on_peer_update: Optional[Callable] = None,
@@ -107,6 +116,9 @@ class GhostEngine:
         self.current_network_type = 'unknown'
         self.peers: Dict[str, dict] = {}  # {ip: {username, last_seen}}
         self.running = False
+        # Random per-engine id carried in beacons, so our own broadcasts are
+        # recognized even when local_ip falls back to 127.0.0.1 (offline)
+        self.instance_id = os.urandom(8).hex()
         
         # Callbacks
         self.on_message_received = on_message_received
@@ -153,18 +165,41 @@ class GhostEngine:
         # Thread locks
         self.peers_lock = threading.Lock()
         
-        # Encryption
-        self.cipher = self._generate_cipher()
+        # Messages and peer sightings waiting to be written to the database
+        # by a single long-lived writer thread (reusing its database connection)
+        self._pending_messages = []
+        self._pending_peers = {}  # {ip: (username, last_seen)}, latest beacon wins
+        self._pending_lock = threading.Lock()
+        self._pending_cv = threading.Condition(self._pending_lock)
+        self._writer_thread = None
+        self._writer_stop = False
+        
+        # Encryption: AES-GCM on the wire, Fernet only to read older peers.
+        # Cipher objects are built once per daily key and reused per message.
+        self.cipher = None
+        self._aead = None
+        self._prev_aead = None  # Yesterday's key, for peers that haven't rotated yet
+        self._key_expires = 0.0
+        self._key_lock = threading.Lock()
+        self._rotate_keys()
         
         # Sockets (initialized in start())
         self.udp_socket = None
         self.tcp_socket = None
         
-        # Threads
+        # Threads: one selector-driven dispatcher runs the beacon, UDP
+        # listener, TCP accept loop and pruning. The per-role attributes
+        # are kept as aliases of it for existing callers.
+        self.dispatcher_thread = None
+        self.network_monitor_thread = None
         self.beacon_thread = None
         self.listener_thread = None
         self.tcp_server_thread = None
         self.pruning_thread = None
+        self._selector = None
+        self._wakeup_r = None  # socketpair used by stop() to interrupt select()
+        self._wakeup_w = None
+        self._started = threading.Event()  # Set once the dispatcher's event loop is running
     
     def _get_local_ip(self) -> str:
         """Get the local IP address of this device with multi-interface support."""
@@ -190,53 +225,111 @@ class GhostEngine:
             print(f"[GhostEngine] Error getting local IP: {e}")
             return "127.0.0.1"
     
-    def _generate_cipher(self) -> Fernet:
+    def _daily_key(self, day: date) -> bytes:
         """
-        Generate a Fernet cipher with a daily rotating key.
-        Key is derived from current date (YYYY-MM-DD format).
+        Derive the 32-byte daily rotating key.
+        Key is derived from the given date (YYYY-MM-DD format).
         In production, combine with Wi-Fi SSID for better security.
         """
+        # Date as seed
+        date_seed = day.strftime("%Y-%m-%d")
+        
+        # In a real implementation, append Wi-Fi SSID:
+        # ssid = get_wifi_ssid()  # Platform-specific
+        # key_material = f"{date_seed}-{ssid}"
+        
+        key_material = f"GhostNet-{date_seed}"
+        
+        # Generate 32-byte key via SHA256
+        return hashlib.sha256(key_material.encode()).digest()
+    
+    def _rotate_keys(self):
+        """
+        Build the ciphers for today's key if the current ones have expired.
+        
+        Called at startup and, via a cheap timestamp check, before each
+        encrypt/decrypt so a long-running engine follows the daily rotation.
+        """
+        with self._key_lock:
+            if time.time() < self._key_expires:
+                return
+            today = date.today()
+            self._prev_aead = self._aead
+            self.cipher = self._generate_cipher(today)
+            self._aead = self._generate_aead(today)
+            self._key_expires = datetime.combine(
+                today + timedelta(days=1), datetime.min.time()
+            ).timestamp()
+    
+    def _generate_cipher(self, day: date) -> Fernet:
+        """Generate the Fernet cipher used to read messages from older peers."""
         try:
-            # Get current date as seed
-            date_seed = datetime.now().strftime("%Y-%m-%d")
-            
-            # In a real implementation, append Wi-Fi SSID:
-            # ssid = get_wifi_ssid()  # Platform-specific
-            # key_material = f"{date_seed}-{ssid}"
-            
-            key_material = f"GhostNet-{date_seed}"
-            
-            # Generate 32-byte key via SHA256
-            key_hash = hashlib.sha256(key_material.encode()).digest()
-            key_b64 = base64.urlsafe_b64encode(key_hash)
-            
+            key_b64 = base64.urlsafe_b64encode(self._daily_key(day))
             return Fernet(key_b64)
         except Exception as e:
             print(f"[GhostEngine] Cipher generation error: {e}")
             # Bug #10 fix: Don't generate new key on error, return None instead
             # Returning a new key breaks decryption of existing messages
+            print("[GhostEngine] WARNING: Legacy cipher unavailable, older peers cannot be read")
+            return None
+    
+    def _generate_aead(self, day: date) -> Optional[AESGCM]:
+        """
+        Generate the AES-128-GCM cipher for outgoing and incoming messages.
+        
+        The AES key is expanded once here and the instance is reused for
+        every message; only the nonce changes per call.
+        """
+        try:
+            hkdf = HKDF(
+                algorithm=hashes.SHA256(),
+                length=16,
+                salt=None,
+                info=b"ghostnet-transport-aesgcm",
+            )
+            return AESGCM(hkdf.derive(self._daily_key(day)))
+        except Exception as e:
+            print(f"[GhostEngine] AES-GCM cipher generation error: {e}")
             print("[GhostEngine] WARNING: Cipher unavailable, message encryption disabled")
             return None
     
     def _encrypt_message(self, message: str) -> bytes:
-        """Encrypt a message string."""
-        if self.cipher is None:
+        """Encrypt a message string as nonce || ciphertext || tag."""
+        if time.time() >= self._key_expires:
+            self._rotate_keys()
+        aead = self._aead
+        if aead is None:
             print("[GhostEngine] WARNING: Cipher not available, storing unencrypted")
             return message.encode('utf-8')
         
         try:
-            return self.cipher.encrypt(message.encode('utf-8'))
+            nonce = os.urandom(self.NONCE_SIZE)
+            return nonce + aead.encrypt(nonce, message.encode('utf-8'), None)
         except Exception as e:
             print(f"[GhostEngine] Encryption error: {e}")
             return message.encode('utf-8')
     
     def _decrypt_message(self, encrypted: bytes) -> str:
-        """Decrypt a message."""
-        if self.cipher is None:
+        """Decrypt a message (AES-GCM, or Fernet from peers on older versions)."""
+        if time.time() >= self._key_expires:
+            self._rotate_keys()
+        aead, prev_aead = self._aead, self._prev_aead
+        if aead is None:
             print("[GhostEngine] WARNING: Cipher not available, returning unencrypted")
             return encrypted.decode('utf-8', errors='ignore')
         
         try:
+            nonce, sealed = encrypted[:self.NONCE_SIZE], encrypted[self.NONCE_SIZE:]
+            try:
+                return aead.decrypt(nonce, sealed, None).decode('utf-8')
+            except InvalidTag:
+                if prev_aead is not None:
+                    try:
+                        return prev_aead.decrypt(nonce, sealed, None).decode('utf-8')
+                    except InvalidTag:
+                        pass
+                if not encrypted.startswith(self.LEGACY_PREFIX) or self.cipher is None:
+                    raise
             return self.cipher.decrypt(encrypted).decode('utf-8')
         except Exception as e:
             print(f"[GhostEngine] Decryption error: {e}")
@@ -249,6 +342,8 @@ class GhostEngine:
             return
         
         self.running = True
+        with self._pending_cv:
+            self._writer_stop = False  # Allow saves to be queued again after a restart
         print(f"[GhostEngine] Starting as '{self.username}' on {self.local_ip}")
         
         # Initialize UDP socket for discovery with retry logic
@@ -260,7 +355,7 @@ class GhostEngine:
                 self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
                 self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
                 self.udp_socket.bind(('', udp_port))
-                self.udp_socket.settimeout(1.0)  # Non-blocking with timeout
+                self.udp_socket.setblocking(False)  # Readiness comes from the selector
                 self.UDP_PORT = udp_port  # Update to working port
                 print(f"[GhostEngine] UDP socket bound to port {udp_port}")
                 udp_success = True
@@ -290,7 +385,7 @@ class GhostEngine:
                 self.tcp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
                 self.tcp_socket.bind(('0.0.0.0', tcp_port))
                 self.tcp_socket.listen(5)
-                self.tcp_socket.settimeout(1.0)
+                self.tcp_socket.setblocking(False)
                 self.TCP_PORT = tcp_port  # Update to working port
                 print(f"[GhostEngine] TCP server listening on port {tcp_port}")
                 tcp_success = True
@@ -318,48 +413,35 @@ class GhostEngine:
         # Start background threads with safe error handling
         threads_started = 0
         
-        # Only start UDP threads if UDP socket is available
-        if self.udp_socket:
-            try:
-                self.beacon_thread = threading.Thread(target=self._beacon_worker, daemon=True)
-                self.beacon_thread.start()
-                threads_started += 1
-                print("[GhostEngine] Beacon thread started")
-            except Exception as e:
-                print(f"[GhostEngine] Failed to start beacon thread: {e}")
-            
-            try:
-                self.listener_thread = threading.Thread(target=self._udp_listener_worker, daemon=True)
-                self.listener_thread.start()
-                threads_started += 1
-                print("[GhostEngine] UDP listener thread started")
-            except Exception as e:
-                print(f"[GhostEngine] Failed to start UDP listener thread: {e}")
-        
-        # Only start TCP thread if TCP socket is available
-        if self.tcp_socket:
-            try:
-                self.tcp_server_thread = threading.Thread(target=self._tcp_server_worker, daemon=True)
-                self.tcp_server_thread.start()
-                threads_started += 1
-                print("[GhostEngine] TCP server thread started")
-            except Exception as e:
-                print(f"[GhostEngine] Failed to start TCP server thread: {e}")
-        
-        # Always start pruning thread
+        # Always start the dispatcher (pruning runs even without sockets)
         try:
-            self.pruning_thread = threading.Thread(target=self._pruning_worker, daemon=True)
-            self.pruning_thread.start()
+            self._selector = selectors.DefaultSelector()
+            self._wakeup_r, self._wakeup_w = socket.socketpair()
+            self._wakeup_r.setblocking(False)
+            self._selector.register(self._wakeup_r, selectors.EVENT_READ, self._on_wakeup)
+            if self.udp_socket:
+                self._selector.register(self.udp_socket, selectors.EVENT_READ, self._on_udp_readable)
+            if self.tcp_socket:
+                self._selector.register(self.tcp_socket, selectors.EVENT_READ, self._on_tcp_readable)
+            
+            self.dispatcher_thread = threading.Thread(target=self._dispatcher_worker, daemon=True)
+            self.dispatcher_thread.start()
             threads_started += 1
-            print("[GhostEngine] Pruning thread started")
+            
+            self.pruning_thread = self.dispatcher_thread
+            if self.udp_socket:
+                self.beacon_thread = self.listener_thread = self.dispatcher_thread
+            if self.tcp_socket:
+                self.tcp_server_thread = self.dispatcher_thread
+            print("[GhostEngine] Dispatcher thread started")
         except Exception as e:
-            print(f"[GhostEngine] Failed to start pruning thread: {e}")
+            print(f"[GhostEngine] Failed to start dispatcher thread: {e}")
         
         # Start network monitoring if available
         if self.network_monitor:
             try:
-                network_monitor_thread = threading.Thread(target=self._network_monitor_worker, daemon=True)
-                network_monitor_thread.start()
+                self.network_monitor_thread = threading.Thread(target=self._network_monitor_worker, daemon=True)
+                self.network_monitor_thread.start()
                 threads_started += 1
                 print("[GhostEngine] Network monitor thread started")
             except Exception as e:
@@ -375,6 +457,14 @@ class GhostEngine:
         """Stop the network engine and clean up resources."""
         print("[GhostEngine] Shutting down...")
         self.running = False
+        self._started.clear()
+        
+        # Interrupt select() so the dispatcher sees running == False at once
+        if self._wakeup_w:
+            try:
+                self._wakeup_w.send(b"\0")
+            except OSError:
+                pass
         
         # Close sockets
         if self.udp_socket:
@@ -389,63 +479,108 @@ class GhostEngine:
             except (OSError, AttributeError):
                 pass
         
-        # Wait for threads to finish
-        for thread in [self.beacon_thread, self.listener_thread, 
-                      self.tcp_server_thread, self.pruning_thread]:
-            if thread and thread.is_alive():
-                thread.join(timeout=2.0)
+        # Wait for the dispatcher to finish (it closes the selector itself)
+        if self.dispatcher_thread and self.dispatcher_thread.is_alive():
+            self.dispatcher_thread.join(timeout=2.0)
+        
+        # Let the writer store whatever is still queued, then exit. Saves
+        # queued after this point are written by their caller instead. No
+        # join timeout: the caller may close the database right after stop().
+        with self._pending_cv:
+            self._writer_stop = True
+            self._pending_cv.notify()
+        if self._writer_thread and self._writer_thread.is_alive():
+            self._writer_thread.join()
         
         print("[GhostEngine] Shutdown complete.")
     
-    def _beacon_worker(self):
-        """Broadcast beacon packets every BEACON_INTERVAL seconds."""
-        while self.running:
-            try:
-                # Skip if no UDP socket available
-                if not self.udp_socket:
-                    time.sleep(self.BEACON_INTERVAL)
-                    continue
-                
-                # Get current username from config (supports dynamic updates)
-                current_username = self.username
-                if self.config_manager:
-                    current_username = self.config_manager.get_username()
-                
-                beacon = {
-                    "type": "BEACON",
-                    "username": current_username,
-                    "ip": self.local_ip
-                }
-                message = json.dumps(beacon).encode('utf-8')
-                
-                # Broadcast to 255.255.255.255
-                self.udp_socket.sendto(message, ('<broadcast>', self.UDP_PORT))
-                # print(f"[Beacon] Broadcasted: {beacon}")
+    def _dispatcher_worker(self):
+        """
+        Single event loop for discovery, pruning and incoming connections.
+        
+        Readable sockets are dispatched to the callback stored with their
+        selector key; the beacon and peer pruning run whenever their
+        deadline passes, and select() sleeps until the next one is due.
+        """
+        next_beacon = time.monotonic()  # First beacon goes out immediately
+        next_prune = next_beacon + self.PRUNE_INTERVAL
+        
+        try:
+            # The selector is registered before this thread starts, so from
+            # here on incoming beacons and connections are being served
+            self._started.set()
+            while self.running:
+                now = time.monotonic()
+                if now >= next_beacon:
+                    if self.udp_socket:
+                        self._send_beacon()
+                    next_beacon = now + self.BEACON_INTERVAL
+                if now >= next_prune:
+                    self._prune_stale_peers()
+                    next_prune = now + self.PRUNE_INTERVAL
                 
-            except Exception as e:
-                print(f"[Beacon] Error broadcasting: {e}")
+                timeout = max(0.0, min(next_beacon, next_prune) - time.monotonic())
+                for key, _ in self._selector.select(timeout):
+                    if not self.running:
+                        break
+                    key.data(key.fileobj)
+        
+        except Exception as e:
+            if self.running:
+                print(f"[Dispatcher] Error: {e}")
+        finally:
+            for sock in (self._wakeup_r, self._wakeup_w):
+                try:
+                    sock.close()
+                except (OSError, AttributeError):
+                    pass
+            self._selector.close()
+    
+    def _on_wakeup(self, sock: socket.socket):
+        """Drain the wakeup socket written to by stop()."""
+        try:
+            sock.recv(64)
+        except OSError:
+            pass
+    
+    def _send_beacon(self):
+        """Broadcast one beacon packet (called every BEACON_INTERVAL seconds)."""
+        try:
+            # Get current username from config (supports dynamic updates)
+            current_username = self.username
+            if self.config_manager:
+                current_username = self.config_manager.get_username()
             
-            time.sleep(self.BEACON_INTERVAL)
+            beacon = {
+                "type": "BEACON",
+                "username": current_username,
+                "ip": self.local_ip,
+                "id": self.instance_id
+            }
+            message = json.dumps(beacon).encode('utf-8')
+            
+            # Broadcast to 255.255.255.255
+            self.udp_socket.sendto(message, ('<broadcast>', self.UDP_PORT))
+            # print(f"[Beacon] Broadcasted: {beacon}")
+            
+        except Exception as e:
+            print(f"[Beacon] Error broadcasting: {e}")
     
-    def _udp_listener_worker(self):
-        """Listen for incoming UDP beacon packets."""
-        while self.running:
+    def _on_udp_readable(self, sock: socket.socket):
+        """Process the beacon packets waiting on the UDP socket."""
+        for _ in range(self.MAX_DATAGRAMS_PER_WAKEUP):
             try:
-                # Skip if no UDP socket available
-                if not self.udp_socket:
-                    time.sleep(1)
-                    continue
-                
-                data, addr = self.udp_socket.recvfrom(self.BUFFER_SIZE)
+                data, addr = sock.recvfrom(self.BUFFER_SIZE)
                 sender_ip = addr[0]
                 
-                # Ignore our own beacons
-                if sender_ip == self.local_ip:
-                    continue
-                
                 # Parse beacon
                 beacon = json.loads(data.decode('utf-8'))
                 
+                # Ignore our own beacons (matched by id, not IP: another
+                # instance may share our address)
+                if beacon.get("id") == self.instance_id:
+                    continue
+                
                 if beacon.get("type") == "BEACON":
                     username = beacon.get("username", "Unknown")
                     current_time = time.time()
@@ -459,11 +594,7 @@ class GhostEngine:
                     
                     # Save to database
                     if self.db_manager:
-                        threading.Thread(
-                            target=self.db_manager.save_peer,
-                            args=(sender_ip, username, current_time),
-                            daemon=True
-                        ).start()
+                        self._queue_peer_save(sender_ip, username, current_time)
                     
                     # Notify UI
                     if self.on_peer_update:
@@ -471,62 +602,55 @@ class GhostEngine:
                     
                     # print(f"[Listener] Discovered peer: {username} @ {sender_ip}")
                 
-            except socket.timeout:
-                continue
+            except (BlockingIOError, InterruptedError):
+                return  # Socket drained
             except json.JSONDecodeError:
                 continue
             except Exception as e:
                 if self.running:
                     print(f"[Listener] Error: {e}")
+                return
     
-    def _pruning_worker(self):
+    def _prune_stale_peers(self):
         """Remove stale peers that haven't been seen recently."""
-        while self.running:
-            time.sleep(3)  # Check every 3 seconds
+        try:
+            current_time = time.time()
+            stale_ips = []
             
-            try:
-                current_time = time.time()
-                stale_ips = []
+            with self.peers_lock:
+                for ip, info in self.peers.items():
+                    if current_time - info["last_seen"] > self.PEER_TIMEOUT:
+                        stale_ips.append(ip)
                 
-                with self.peers_lock:
-                    for ip, info in self.peers.items():
-                        if current_time - info["last_seen"] > self.PEER_TIMEOUT:
-                            stale_ips.append(ip)
-                    
-                    for ip in stale_ips:
-                        username = self.peers[ip]["username"]
-                        del self.peers[ip]
-                        print(f"[Pruning] Removed stale peer: {username} @ {ip}")
+                for ip in stale_ips:
+                    username = self.peers[ip]["username"]
+                    del self.peers[ip]
+                    print(f"[Pruning] Removed stale peer: {username} @ {ip}")
+            
+            # Notify UI if peers were removed
+            if stale_ips and self.on_peer_update:
+                self.on_peer_update(self.get_peers())
                 
-                # Notify UI if peers were removed
-                if stale_ips and self.on_peer_update:
-                    self.on_peer_update(self.get_peers())
-                    
-            except Exception as e:
-                print(f"[Pruning] Error: {e}")
+        except Exception as e:
+            print(f"[Pruning] Error: {e}")
     
-    def _tcp_server_worker(self):
-        """Accept incoming TCP connections and handle messages."""
-        while self.running:
-            try:
-                # Skip if no TCP socket available
-                if not self.tcp_socket:
-                    time.sleep(1)
-                    continue
-                
-                conn, addr = self.tcp_socket.accept()
-                # Handle each connection in a separate thread
-                threading.Thread(
-                    target=self._handle_tcp_connection,
-                    args=(conn, addr),
-                    daemon=True
-                ).start()
-                
-            except socket.timeout:
-                continue
-            except Exception as e:
-                if self.running:
-                    print(f"[TCP Server] Error: {e}")
+    def _on_tcp_readable(self, sock: socket.socket):
+        """Accept an incoming TCP connection and handle it on its own thread."""
+        try:
+            conn, addr = sock.accept()
+            conn.setblocking(True)  # Handlers use plain blocking reads
+            # Handle each connection in a separate thread
+            threading.Thread(
+                target=self._handle_tcp_connection,
+                args=(conn, addr),
+                daemon=True
+            ).start()
+            
+        except (BlockingIOError, InterruptedError):
+            pass
+        except Exception as e:
+            if self.running:
+                print(f"[TCP Server] Error: {e}")
     
     def _handle_tcp_connection(self, conn: socket.socket, addr: tuple):
         """Handle an individual TCP connection (text or file)."""
@@ -580,11 +704,7 @@ class GhostEngine:
             
             # Save to database (in background)
             if self.db_manager:
-                threading.Thread(
-                    target=self.db_manager.save_message,
-                    args=(sender_ip, "PEER", message_text, "TEXT", None, timestamp_unix),
-                    daemon=True
-                ).start()
+                self._queue_message_save(sender_ip, "PEER", message_text, "TEXT", None, timestamp_unix)
             
             # Notify UI via callback
             if self.on_message_received:
@@ -651,11 +771,7 @@ class GhostEngine:
             
             # Save to database (in background)
             if self.db_manager:
-                threading.Thread(
-                    target=self.db_manager.save_message,
-                    args=(sender_ip, "PEER", filename, "FILE", filepath, timestamp_unix),
-                    daemon=True
-                ).start()
+                self._queue_message_save(sender_ip, "PEER", filename, "FILE", filepath, timestamp_unix)
             
             # Notify UI via callback
             if self.on_file_received:
@@ -664,6 +780,59 @@ class GhostEngine:
         except Exception as e:
             print(f"[File Transfer] Error: {e}")
     
+    def _queue_message_save(self, peer_ip: str, sender: str, content: str,
+                            message_type: str, file_path: Optional[str], timestamp: float):
+        """
+        Queue a message for persistence without blocking the caller.
+        
+        A single long-lived writer thread drains the queue, so messages
+        arriving in a burst are stored together in one database transaction
+        and every write reuses that thread's connection.
+        """
+        message = (peer_ip, sender, content, message_type, file_path, timestamp)
+        with self._pending_cv:
+            if not self._writer_stop:
+                self._pending_messages.append(message)
+                self._wake_writer()
+                return
+        # stop() has already drained the queue: write it here rather than lose it
+        self.db_manager.save_messages_bulk([message])
+    
+    def _queue_peer_save(self, peer_ip: str, username: str, last_seen: float):
+        """Queue a peer sighting for the writer thread (repeat beacons coalesce)."""
+        with self._pending_cv:
+            if not self._writer_stop:
+                self._pending_peers[peer_ip] = (username, last_seen)
+                self._wake_writer()
+                return
+        self.db_manager.save_peer(peer_ip, username, last_seen)
+    
+    def _wake_writer(self):
+        """Start the writer thread if needed and signal it (caller holds _pending_cv)."""
+        if self._writer_thread is None or not self._writer_thread.is_alive():
+            self._writer_thread = threading.Thread(target=self._message_writer_worker, daemon=True)
+            self._writer_thread.start()
+        self._pending_cv.notify()
+    
+    def _message_writer_worker(self):
+        """Write queued messages and peers to the database until stop() drains the queue."""
+        while True:
+            with self._pending_cv:
+                while not (self._pending_messages or self._pending_peers or self._writer_stop):
+                    self._pending_cv.wait()
+                batch, peers = self._pending_messages, self._pending_peers
+                self._pending_messages, self._pending_peers = [], {}
+                if not batch and not peers:
+                    return  # Stopped with nothing left to write
+            
+            for peer_ip, (username, last_seen) in peers.items():
+                self.db_manager.save_peer(peer_ip, username, last_seen)
+            if batch:
+                try:
+                    self.db_manager.save_messages_bulk(batch)
+                except Exception as e:
+                    print(f"[GhostEngine] Error saving messages: {e}")
+    
     def _sanitize_filename(self, filename: str) -> str:
         """Sanitize filename to prevent path traversal attacks."""
         # Store original filename for extension extraction
@@ -700,13 +869,36 @@ class GhostEngine:
                 sha256.update(chunk)
         return sha256.hexdigest()
     
-    def send_message(self, target_ip: str, message_text: str) -> bool:
+    @staticmethod
+    def _send_buffers(sock: socket.socket, buffers):
+        """
+        Send several buffers with one scatter-gather write (writev).
+        
+        Avoids concatenating them into a new bytes object first. Falls back
+        to sendall() on platforms without socket.sendmsg (Windows).
+        """
+        if not hasattr(sock, 'sendmsg'):
+            sock.sendall(b"".join(buffers))
+            return
+        
+        views = [memoryview(buf) for buf in buffers]
+        while views:
+            sent = sock.sendmsg(views)
+            # Drop fully written buffers, then trim a partially written one
+            while views and sent >= len(views[0]):
+                sent -= len(views[0])
+                views.pop(0)
+            if views and sent:
+                views[0] = views[0][sent:]
+    
+    def send_message(self, target_ip: str, message_text: str, port: Optional[int] = None) -> bool:
         """
         Send an encrypted text message to a target peer via TCP.
         
         Args:
             target_ip: IP address of the target peer
             message_text: The message to send
+            port: Peer's TCP port (defaults to our own TCP_PORT)
             
         Returns:
             True if sent successfully, False otherwise
@@ -726,10 +918,10 @@ class GhostEngine:
             # Create TCP connection
             client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             client_socket.settimeout(10.0)  # 10 second timeout
-            client_socket.connect((target_ip, self.TCP_PORT))
+            client_socket.connect((target_ip, port or self.TCP_PORT))
             
             # Send header + delimiter
-            client_socket.sendall(encrypted_header + self.HEADER_DELIMITER)
+            self._send_buffers(client_socket, (encrypted_header, self.HEADER_DELIMITER))
             
             client_socket.close()
             print(f"[Send] Message sent to {target_ip}")
@@ -737,11 +929,7 @@ class GhostEngine:
             # Save to database (in background)
             if self.db_manager:
                 timestamp_unix = time.time()
-                threading.Thread(
-                    target=self.db_manager.save_message,
-                    args=(target_ip, "ME", message_text, "TEXT", None, timestamp_unix),
-                    daemon=True
-                ).start()
+                self._queue_message_save(target_ip, "ME", message_text, "TEXT", None, timestamp_unix)
             
             return True
             
@@ -798,7 +986,7 @@ class GhostEngine:
                 client_socket.connect((target_ip, self.TCP_PORT))
                 
                 # Send header + delimiter
-                client_socket.sendall(encrypted_header + self.HEADER_DELIMITER)
+                self._send_buffers(client_socket, (encrypted_header, self.HEADER_DELIMITER))
                 
                 # Send file in chunks
                 bytes_sent = 0
@@ -826,11 +1014,7 @@ class GhostEngine:
                 # Save to database (in background)
                 if self.db_manager:
                     timestamp_unix = time.time()
-                    threading.Thread(
-                        target=self.db_manager.save_message,
-                        args=(target_ip, "ME", filename, "FILE", file_path, timestamp_unix),
-                        daemon=True
-                    ).start()
+                    self._queue_message_save(target_ip, "ME", filename, "FILE", file_path, timestamp_unix)
                 
                 return True
                 
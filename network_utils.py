@@ -20,6 +20,14 @@ except ImportError:
 class NetworkDetector:
     """Detect and manage network interfaces across all connection types."""
     
+    # Interface name prefixes, checked in this order (first match wins).
+    # Names the old substring match classified by an inner part (p2p-wlan0-0,
+    # r_rmnet_data0, br-lan, ...) are listed explicitly to keep that result.
+    HOTSPOT_PREFIXES = ('ap', 'softap', 'swlan', 'hotspot', 'tether', 'rndis', 'ncm')
+    CELLULAR_PREFIXES = ('rmnet', 'v4-rmnet', 'r_rmnet', 'rev_rmnet', 'ccmni', 'cellular', 'mobile', 'wwan')
+    ETHERNET_PREFIXES = ('eth', 'en', 'lan', 'br-lan', 'vlan')
+    WIFI_PREFIXES = ('wlan', 'wifi', 'wl', 'ath', 'p2p-wlan')
+    
     @staticmethod
     def get_all_interfaces() -> Dict[str, dict]:
         """
@@ -114,22 +122,24 @@ class NetworkDetector:
     @staticmethod
     def _detect_interface_type(iface: str, ip: str) -> str:
         """Detect interface type based on name and IP."""
-        iface_lower = iface.lower()
+        # Match on prefixes: substring checks misread names like 'wlan0'
+        # (contains 'lan') as Ethernet
+        name = iface.casefold()
         
         # Hotspot/Tethering patterns
-        if any(x in iface_lower for x in ['ap', 'hotspot', 'tether', 'rndis', 'ncm']):
+        if name.startswith(NetworkDetector.HOTSPOT_PREFIXES):
             return 'hotspot'
         
         # Cellular/Mobile patterns
-        if any(x in iface_lower for x in ['rmnet', 'ccmni', 'cellular', 'mobile', 'wwan']):
+        if name.startswith(NetworkDetector.CELLULAR_PREFIXES):
             return 'cellular'
         
         # Ethernet patterns
-        if any(x in iface_lower for x in ['eth', 'en0', 'en1', 'lan']):
+        if name.startswith(NetworkDetector.ETHERNET_PREFIXES):
             return 'ethernet'
         
         # Wi-Fi patterns
-        if any(x in iface_lower for x in ['wlan', 'wifi', 'wl', 'ath']):
+        if name.startswith(NetworkDetector.WIFI_PREFIXES):
             return 'wifi'
         
         # Check IP range patterns for better classification
@@ -1,16 +1,109 @@
 """
 Ghost Net - Encrypted Storage Module
 Persistent storage for chat history and file records using SQLite with encryption.
-All message content is encrypted at rest using Fernet symmetric encryption.
+All message content is encrypted at rest using AES-GCM authenticated encryption.
 """
 
 import sqlite3
 import os
 import time
+import base64
+import zlib
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Iterator, Optional, Tuple
+from collections import OrderedDict, namedtuple
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 import threading
+import weakref
+from functools import cached_property
+
+# OS keystore for the database key (optional, falls back to a key file)
+try:
+    import keyring
+    from keyring.errors import NoKeyringError, PasswordDeleteError
+    KEYRING_AVAILABLE = True
+except ImportError:
+    KEYRING_AVAILABLE = False
+
+
+class Message(namedtuple('Message', 'id sender content message_type timestamp file_path')):
+    """
+    A decrypted chat message returned by get_history().
+    
+    Fields are read as attributes (msg.content); msg['content'],
+    msg.get('file_path') and 'content' in msg still work for code written
+    against dict rows.
+    """
+    __slots__ = ()
+    
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return super().__getitem__(key)
+    
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._fields else default
+    
+    def __contains__(self, key):
+        return key in self._fields
+
+
+# SQL statements used on hot paths. Keeping the text identical across calls
+# lets each connection's statement cache reuse the prepared statement.
+SQL_UPSERT_PEER = '''
+    INSERT OR REPLACE INTO peers (ip_address, username, last_seen)
+    VALUES (?, ?, ?)
+'''
+SQL_SELECT_USERNAME = 'SELECT username FROM peers WHERE ip_address = ?'
+SQL_SELECT_PEERS = '''
+    SELECT ip_address, username, last_seen
+    FROM peers
+    ORDER BY last_seen DESC
+'''
+SQL_INSERT_MESSAGE = '''
+    INSERT INTO messages (peer_ip, sender, content, message_type, timestamp, file_path)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+SQL_INSERT_TEXT_MESSAGE = '''
+    INSERT INTO messages (peer_ip, sender, content, message_type, timestamp, file_path)
+    VALUES (?, ?, ?, 'TEXT', ?, NULL)
+'''
+SQL_SELECT_HISTORY = '''
+    SELECT id, sender, content, message_type, timestamp, file_path
+    FROM messages
+    WHERE peer_ip = ?
+    ORDER BY timestamp ASC
+    LIMIT ?
+'''
+SQL_SELECT_HISTORY_PAGE = '''
+    SELECT id, sender, content, message_type, timestamp, file_path
+    FROM messages
+    WHERE peer_ip = ? AND (timestamp > ? OR (timestamp = ? AND id > ?))
+    ORDER BY timestamp ASC, id ASC
+    LIMIT ?
+'''
+SQL_SELECT_LEGACY = '''
+    SELECT id, content FROM messages
+    WHERE peer_ip = ? AND substr(content, 1, ?) = ?
+'''
+SQL_UPDATE_CONTENT = 'UPDATE messages SET content = ? WHERE id = ?'
+SQL_DELETE_OLD_BATCH = '''
+    DELETE FROM messages WHERE id IN (
+        SELECT id FROM messages WHERE timestamp < ? LIMIT ?
+    )
+'''
+SQL_DELETE_PEER_HISTORY = 'DELETE FROM messages WHERE peer_ip = ?'
+SQL_SELECT_STATISTICS = '''
+    SELECT (SELECT COUNT(*) FROM messages),
+           (SELECT COUNT(*) FROM peers),
+           (SELECT MIN(timestamp) FROM messages),
+           (SELECT MAX(timestamp) FROM messages)
+'''
 
 
 class DatabaseManager:
@@ -19,12 +112,29 @@ class DatabaseManager:
     
     Features:
     - SQLite database for chat history and file records
-    - Fernet encryption for message content at rest
+    - AES-GCM encryption for message content at rest
+    - Transparent migration of legacy Fernet-encrypted rows
     - Automatic key generation and storage
     - Thread-safe database operations
     - Privacy-focused cleanup of old messages
     """
     
+    OPTIMIZE_INTERVAL = 15 * 60  # seconds between PRAGMA optimize runs
+    USERNAME_CACHE_SIZE = 256    # peers kept in the username LRU cache
+    NONCE_SIZE = 12              # AES-GCM nonce length in bytes
+    LEGACY_PREFIX = b"gAAAA"     # Every Fernet token starts with this
+    COMPRESS_THRESHOLD = 256     # plaintext bytes before zlib compression kicks in
+    FLAG_RAW = b"\x00"           # Plaintext prefix: stored as-is
+    FLAG_ZLIB = b"\x01"          # Plaintext prefix: zlib-compressed
+    CLEANUP_BATCH_SIZE = 5000    # rows deleted per cleanup transaction
+    INCREMENTAL_VACUUM_PAGES = 200  # free pages released per incremental vacuum
+    AUTO_VACUUM_INCREMENTAL = 2  # PRAGMA auto_vacuum value for INCREMENTAL
+    SECONDS_PER_HOUR = 3600.0    # float so cutoffs compare directly with REAL timestamps
+    STATEMENT_CACHE_SIZE = 256   # prepared statements kept per connection
+    EXPORT_FLUSH_EVERY = 1024    # messages formatted per export write
+    KEYRING_SERVICE = "ghostnet"
+    KEYRING_USERNAME_PREFIX = "db_key:"  # Followed by the absolute key path
+    
     def __init__(self, db_path: str = "ghostnet.db", key_path: str = "secret.key"):
         """
         Initialize the database manager.
@@ -35,37 +145,64 @@ class DatabaseManager:
         """
         self.db_path = db_path
         self.key_path = key_path
-        self.cipher = None
-        self.db_lock = threading.Lock()
+        # Key loading and schema creation are deferred until first use so
+        # short-lived callers that never touch the database pay nothing
+        self._init_lock = threading.Lock()
+        self._ciphers: Optional[Tuple[Optional[Fernet], Optional[AESGCM]]] = None
+        self._schema_ready = False
+        # WAL lets readers run concurrently on their own per-thread
+        # connections; only writes are serialized through this lock
+        self._write_lock = threading.Lock()
+        # Guards the connection registry and username cache
+        self._state_lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: Dict[int, sqlite3.Connection] = {}  # {thread ident: conn}
+        # LRU cache of ip -> username; assumes no other process writes the DB
+        self._username_cache: 'OrderedDict[str, Optional[str]]' = OrderedDict()
+        self._migrated_peers = set()
         self.initialization_error = None
+        self._optimize_thread = None  # Started by the first connection, see _conn()
+        self._optimize_stop = threading.Event()
+        self._closed = False
         
-        # Initialize encryption and database with error handling
-        try:
-            self._initialize_encryption()
-        except Exception as e:
-            self.initialization_error = f"Encryption init failed: {e}"
-            print(f"[DatabaseManager] WARNING: {self.initialization_error}")
-        
-        try:
-            self._initialize_database()
-        except Exception as e:
-            self.initialization_error = f"Database init failed: {e}"
-            print(f"[DatabaseManager] WARNING: {self.initialization_error}")
-        
-        if self.cipher:
-            print(f"[DatabaseManager] Initialized with database: {db_path}")
-        else:
-            print(f"[DatabaseManager] Initialized with limited functionality (encryption unavailable)")
+        print(f"[DatabaseManager] Initialized with database: {db_path}")
+    
+    @cached_property
+    def cipher(self) -> Optional[Fernet]:
+        """Fernet cipher, only used to read legacy rows (loaded on first use)."""
+        return self._load_ciphers()[0]
     
-    def _initialize_encryption(self):
-        """Initialize or load the encryption key."""
+    @cached_property
+    def aead(self) -> Optional[AESGCM]:
+        """AES-GCM cipher for message content (loaded on first use)."""
+        return self._load_ciphers()[1]
+    
+    def _load_ciphers(self) -> Tuple[Optional[Fernet], Optional[AESGCM]]:
+        """Initialize encryption exactly once, shared by cipher and aead."""
+        with self._init_lock:
+            if self._ciphers is None:
+                try:
+                    self._ciphers = self._initialize_encryption()
+                except Exception as e:
+                    self.initialization_error = f"Encryption init failed: {e}"
+                    print(f"[DatabaseManager] WARNING: {self.initialization_error}")
+                    self._ciphers = (None, None)
+            return self._ciphers
+    
+    def _initialize_encryption(self) -> Tuple[Optional[Fernet], Optional[AESGCM]]:
+        """
+        Initialize or load the encryption key.
+        
+        Returns:
+            (Fernet, AESGCM) ciphers, or (None, None) if no key is available
+        """
         try:
             key = self._get_or_create_key()
             if key:
-                self.cipher = Fernet(key)
                 print("[DatabaseManager] Encryption initialized")
-            else:
-                print("[DatabaseManager] WARNING: No encryption key available")
+                return Fernet(key), AESGCM(self._derive_aead_key(key))
+            print("[DatabaseManager] WARNING: No encryption key available")
+            return None, None
         except Exception as e:
             print(f"[DatabaseManager] Encryption initialization failed: {e}")
             raise
@@ -74,9 +211,33 @@ class DatabaseManager:
         """
         Get existing encryption key or generate a new one.
         
+        The OS keystore (libsecret/Keychain/Credential Manager) is tried
+        first; the key file is used when no keyring backend is available
+        or when an existing install already has one.
+        
+        A keyring that fails to answer (locked keychain, no D-Bus) is not
+        treated as "no key": without a key file, loading fails instead of
+        generating a new key that would orphan the existing history.
+        
         Returns:
             Encryption key (32 bytes, base64 encoded)
+        
+        Raises:
+            RuntimeError: If the keyring could not be read and no key file exists
         """
+        keyring_error = None
+        try:
+            key = self._load_keyring_key()
+        except Exception as e:
+            print(f"[DatabaseManager] Keyring read failed: {e}")
+            key, keyring_error = None, e
+        if key:
+            print("[DatabaseManager] Loaded encryption key from OS keyring")
+            return key
+        
+        if keyring_error is not None and not os.path.exists(self.key_path):
+            raise RuntimeError(f"Keyring read failed, not generating a new key: {keyring_error}")
+        
         if os.path.exists(self.key_path):
             # Load existing key
             try:
@@ -91,6 +252,10 @@ class DatabaseManager:
         # Generate new key
         key = Fernet.generate_key()
         
+        if self._store_keyring_key(key):
+            print("[DatabaseManager] Generated new encryption key in OS keyring")
+            return key
+        
         try:
             with open(self.key_path, 'wb') as f:
                 f.write(key)
@@ -107,80 +272,322 @@ class DatabaseManager:
         
         return key
     
+    @property
+    def _keyring_username(self) -> str:
+        """Keyring entry name, unique per key file so separate databases never share a key."""
+        return self.KEYRING_USERNAME_PREFIX + os.path.abspath(self.key_path)
+    
+    def _load_keyring_key(self) -> Optional[bytes]:
+        """
+        Read the key from the OS keyring.
+        
+        Returns:
+            The key, or None if no backend is installed or no key is stored
+        
+        Raises:
+            Exception: Whatever the keyring backend raised when it failed to answer
+        """
+        if not KEYRING_AVAILABLE:
+            return None
+        try:
+            key = keyring.get_password(self.KEYRING_SERVICE, self._keyring_username)
+        except NoKeyringError:
+            return None
+        return key.encode('ascii') if key else None
+    
+    def _store_keyring_key(self, key: bytes) -> bool:
+        """Save the key to the OS keyring; returns False if that failed."""
+        if not KEYRING_AVAILABLE:
+            return False
+        try:
+            keyring.set_password(self.KEYRING_SERVICE, self._keyring_username, key.decode('ascii'))
+            return True
+        except Exception as e:
+            print(f"[DatabaseManager] Could not store key in keyring: {e}")
+            return False
+    
+    def delete_key(self):
+        """Remove the encryption key from the OS keyring and from disk."""
+        if KEYRING_AVAILABLE:
+            try:
+                keyring.delete_password(self.KEYRING_SERVICE, self._keyring_username)
+                print("[DatabaseManager] Encryption key removed from OS keyring")
+            except (NoKeyringError, PasswordDeleteError):
+                pass  # Nothing stored there
+            except Exception as e:
+                print(f"[DatabaseManager] Could not remove key from keyring: {e}")
+        
+        if os.path.exists(self.key_path):
+            os.remove(self.key_path)
+            print(f"[DatabaseManager] Encryption key deleted: {self.key_path}")
+    
+    @staticmethod
+    def _derive_aead_key(key: bytes) -> bytes:
+        """Derive a dedicated 256-bit AES-GCM key from the stored Fernet key."""
+        return HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=b"ghostnet-storage-aesgcm",
+        ).derive(base64.urlsafe_b64decode(key))
+    
     def _encrypt_content(self, content: str) -> bytes:
-        """Encrypt message content."""
-        if self.cipher is None:
-            print("[DatabaseManager] WARNING: Cipher not available, storing unencrypted")
-            return content.encode('utf-8')
+        """
+        Encrypt message content as nonce || ciphertext || tag.
+        
+        Raises:
+            RuntimeError: If the key could not be loaded or encryption failed;
+                content is never stored unencrypted
+        """
+        if self.aead is None:
+            raise RuntimeError(f"Cipher not available, not storing message "
+                               f"({self.initialization_error or 'no encryption key'})")
         
         try:
-            return self.cipher.encrypt(content.encode('utf-8'))
+            data = content.encode('utf-8')
+            if len(data) > self.COMPRESS_THRESHOLD:
+                compressed = zlib.compress(data, 6)
+                if len(compressed) < len(data):
+                    data = self.FLAG_ZLIB + compressed
+                else:
+                    data = self.FLAG_RAW + data
+            else:
+                data = self.FLAG_RAW + data
+            nonce = os.urandom(self.NONCE_SIZE)
+            return nonce + self.aead.encrypt(nonce, data, None)
         except Exception as e:
-            print(f"[DatabaseManager] Encryption error: {e}")
-            return content.encode('utf-8')
+            raise RuntimeError(f"Encryption error: {e}") from e
     
     def _decrypt_content(self, encrypted: bytes) -> str:
-        """Decrypt message content."""
-        if self.cipher is None:
+        """Decrypt message content (AES-GCM, or Fernet for legacy rows)."""
+        if self.aead is None:
             print("[DatabaseManager] WARNING: Cipher not available, returning unencrypted")
             return encrypted.decode('utf-8', errors='ignore')
         
         try:
-            return self.cipher.decrypt(encrypted).decode('utf-8')
+            if encrypted.startswith(self.LEGACY_PREFIX):
+                return self.cipher.decrypt(encrypted).decode('utf-8')
+            nonce = encrypted[:self.NONCE_SIZE]
+            data = self.aead.decrypt(nonce, encrypted[self.NONCE_SIZE:], None)
+            flag, body = data[:1], data[1:]
+            if flag == self.FLAG_ZLIB:
+                return zlib.decompress(body).decode('utf-8')
+            if flag == self.FLAG_RAW:
+                return body.decode('utf-8')
+            raise ValueError(f"Unknown content flag: {flag!r}")
         except Exception as e:
             print(f"[DatabaseManager] Decryption error: {e}")
             return encrypted.decode('utf-8', errors='ignore')
     
-    def _initialize_database(self):
-        """Create database tables if they don't exist."""
-        with self.db_lock:
+    def _safe_decrypt(self, encrypted: bytes) -> str:
+        """Decrypt content, substituting a placeholder on failure."""
+        try:
+            return self._decrypt_content(encrypted)
+        except:
+            return "[Decryption Failed]"
+    
+    def _decrypt_many(self, blobs: List[bytes]) -> List[str]:
+        """Decrypt a page of message contents, preserving order."""
+        return [self._safe_decrypt(blob) for blob in blobs]
+    
+    def _migrate_legacy_rows(self, conn: sqlite3.Connection, peer_ip: str):
+        """
+        Re-encrypt a peer's Fernet rows with AES-GCM.
+        
+        Runs once per peer per process, on the first history load.
+        """
+        if peer_ip in self._migrated_peers or self.aead is None:
+            return
+        
+        with self._write_lock:
+            if peer_ip in self._migrated_peers:
+                return
+            
+            cursor = conn.cursor()
+            cursor.execute(SQL_SELECT_LEGACY, (peer_ip, len(self.LEGACY_PREFIX), self.LEGACY_PREFIX))
+            
+            updates = []
+            for msg_id, token in cursor.fetchall():
+                try:
+                    plaintext = self.cipher.decrypt(token).decode('utf-8')
+                except Exception:
+                    continue  # Leave undecryptable rows untouched
+                updates.append((self._encrypt_content(plaintext), msg_id))
+            
+            if updates:
+                cursor.execute('BEGIN IMMEDIATE')
+                try:
+                    cursor.executemany(SQL_UPDATE_CONTENT, updates)
+                    cursor.execute('COMMIT')
+                except Exception:
+                    cursor.execute('ROLLBACK')
+                    raise
+                print(f"[DatabaseManager] Migrated {len(updates)} legacy messages for {peer_ip}")
+            
+            self._migrated_peers.add(peer_ip)
+    
+    def _conn(self) -> sqlite3.Connection:
+        """
+        Get this thread's long-lived connection, opening it on first use.
+        
+        Connections are kept for the life of the thread so the SQLite page
+        cache stays warm across calls. Autocommit mode is used; callers
+        that need a multi-statement transaction issue BEGIN/COMMIT.
+        
+        Raises:
+            sqlite3.ProgrammingError: After close(), so a late write can't
+                recreate a database that panic mode is deleting
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+            # Timeout prevents hanging when another connection holds the lock
+            conn = sqlite3.connect(self.db_path, timeout=10.0,
+                                   check_same_thread=False, isolation_level=None,
+                                   cached_statements=self.STATEMENT_CACHE_SIZE)
+            self._configure_connection(conn)
+            self._local.conn = conn
+            with self._state_lock:
+                self._reap_connections()
+                self._connections[threading.get_ident()] = conn
+                if self._optimize_thread is None and not self._closed:
+                    self._schedule_optimize()
+        if not self._schema_ready:
+            self._ensure_schema(conn)
+        return conn
+    
+    def _ensure_schema(self, conn: sqlite3.Connection):
+        """Create the schema on first database access."""
+        with self._init_lock:
+            if self._schema_ready:
+                return
             try:
-                # Add timeout to prevent hanging on first connection
-                conn = sqlite3.connect(self.db_path, timeout=10.0)
-                conn.execute('PRAGMA busy_timeout = 10000')  # 10 second timeout
-                cursor = conn.cursor()
-                
-                # Peers table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS peers (
-                        ip_address TEXT PRIMARY KEY,
-                        username TEXT NOT NULL,
-                        last_seen REAL NOT NULL
-                    )
-                ''')
-                
-                # Messages table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS messages (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        peer_ip TEXT NOT NULL,
-                        sender TEXT NOT NULL,
-                        content BLOB NOT NULL,
-                        message_type TEXT NOT NULL,
-                        timestamp REAL NOT NULL,
-                        file_path TEXT,
-                        FOREIGN KEY (peer_ip) REFERENCES peers(ip_address)
-                    )
-                ''')
-                
-                # Create indexes for performance
-                cursor.execute('''
-                    CREATE INDEX IF NOT EXISTS idx_messages_peer 
-                    ON messages(peer_ip)
-                ''')
-                
-                cursor.execute('''
-                    CREATE INDEX IF NOT EXISTS idx_messages_timestamp 
-                    ON messages(timestamp)
-                ''')
-                
-                conn.commit()
-                conn.close()
-                
-                print("[DatabaseManager] Database tables initialized")
-                
+                self._initialize_database(conn)
+                self._schema_ready = True
             except Exception as e:
-                print(f"[DatabaseManager] Database initialization error: {e}")
+                self.initialization_error = f"Database init failed: {e}"
+                print(f"[DatabaseManager] WARNING: {self.initialization_error}")
+    
+    def _reap_connections(self):
+        """Close cached connections whose owning thread has exited (caller holds _state_lock)."""
+        alive = {t.ident for t in threading.enumerate()}
+        for ident in [i for i in self._connections if i not in alive]:
+            try:
+                self._connections.pop(ident).close()
+            except Exception:
+                pass
+    
+    def _configure_connection(self, conn: sqlite3.Connection):
+        """
+        Apply performance PRAGMAs to a freshly opened connection.
+        
+        WAL turns each commit into a single sequential append and lets
+        readers run concurrently with the writer. In-memory databases
+        have no journal file, so only the cache settings apply there.
+        """
+        conn.execute('PRAGMA busy_timeout = 10000')  # 10 second timeout
+        # Must precede journal_mode: it only applies before the file is initialized
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        if self.db_path != ':memory:' and not self.db_path.startswith('file::memory:'):
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute('PRAGMA mmap_size = 268435456')  # 256 MB
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.execute('PRAGMA cache_size = -20000')  # ~20 MB
+    
+    def _schedule_optimize(self):
+        """
+        Run PRAGMA optimize every OPTIMIZE_INTERVAL seconds in the background.
+        
+        One long-lived thread does every run, so it reuses a single cached
+        connection. It only holds a weak reference, so a manager that is
+        dropped without close() can still be garbage collected; collection
+        stops the thread too.
+        """
+        stop = self._optimize_stop
+        thread = threading.Thread(
+            target=DatabaseManager._optimize_worker,
+            args=(weakref.ref(self, lambda _: stop.set()), stop, self.OPTIMIZE_INTERVAL),
+            daemon=True
+        )
+        thread.start()
+        self._optimize_thread = thread
+    
+    @staticmethod
+    def _optimize_worker(manager_ref, stop: threading.Event, interval: float):
+        """Refresh query planner statistics every interval until stopped."""
+        while not stop.wait(interval):
+            manager = manager_ref()
+            if manager is None or manager._closed:
+                return
+            manager._optimize()
+            del manager  # Don't keep the manager alive while waiting
+    
+    def _optimize(self):
+        """Let SQLite refresh query planner statistics where useful."""
+        if not self._schema_ready:
+            return  # Never create the database just to optimize it
+        with self._write_lock:
+            try:
+                conn = self._conn()
+                conn.execute('PRAGMA optimize')
+            except Exception as e:
+                print(f"[DatabaseManager] Error optimizing database: {e}")
+    
+    def _initialize_database(self, conn: sqlite3.Connection):
+        """
+        Create database tables if they don't exist.
+        
+        Runs under _init_lock rather than _write_lock: it is reached from
+        _conn(), which callers may invoke while already holding _write_lock.
+        """
+        try:
+            cursor = conn.cursor()
+            
+            # Peers table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS peers (
+                    ip_address TEXT PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    last_seen REAL NOT NULL
+                )
+            ''')
+            
+            # Messages table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    peer_ip TEXT NOT NULL,
+                    sender TEXT NOT NULL,
+                    content BLOB NOT NULL,
+                    message_type TEXT NOT NULL,
+                    timestamp REAL NOT NULL,
+                    file_path TEXT,
+                    FOREIGN KEY (peer_ip) REFERENCES peers(ip_address)
+                )
+            ''')
+            
+            # Create indexes for performance
+            # (peer_ip, timestamp) serves both the WHERE and ORDER BY of
+            # history queries, making the old peer_ip-only index redundant
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_messages_peer_ts
+                ON messages(peer_ip, timestamp)
+            ''')
+            
+            cursor.execute('DROP INDEX IF EXISTS idx_messages_peer')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_messages_timestamp 
+                ON messages(timestamp)
+            ''')
+            
+            print("[DatabaseManager] Database tables initialized")
+            
+        except Exception as e:
+            print(f"[DatabaseManager] Database initialization error: {e}")
+            raise
     
     def save_peer(self, ip_address: str, username: str, last_seen: Optional[float] = None):
         """
@@ -194,29 +601,19 @@ class DatabaseManager:
         if last_seen is None:
             last_seen = time.time()
         
-        conn = None
-        with self.db_lock:
+        with self._write_lock:
             try:
-                conn = sqlite3.connect(self.db_path, timeout=10.0)
+                conn = self._conn()
                 cursor = conn.cursor()
                 
-                cursor.execute('''
-                    INSERT OR REPLACE INTO peers (ip_address, username, last_seen)
-                    VALUES (?, ?, ?)
-                ''', (ip_address, username, last_seen))
+                cursor.execute(SQL_UPSERT_PEER, (ip_address, username, last_seen))
                 
-                conn.commit()
+                self._cache_username(ip_address, username)
                 
                 # print(f"[DatabaseManager] Saved peer: {username} @ {ip_address}")
                 
             except Exception as e:
                 print(f"[DatabaseManager] Error saving peer: {e}")
-            finally:
-                if conn:
-                    try:
-                        conn.close()
-                    except:
-                        pass
     
     def get_peer_username(self, ip_address: str) -> Optional[str]:
         """
@@ -228,28 +625,33 @@ class DatabaseManager:
         Returns:
             Username or None if not found
         """
-        conn = None
-        with self.db_lock:
-            try:
-                conn = sqlite3.connect(self.db_path, timeout=10.0)
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    SELECT username FROM peers WHERE ip_address = ?
-                ''', (ip_address,))
-                
-                result = cursor.fetchone()
-                return result[0] if result else None
-                
-            except Exception as e:
-                print(f"[DatabaseManager] Error getting peer username: {e}")
-                return None
-            finally:
-                if conn:
-                    try:
-                        conn.close()
-                    except:
-                        pass
+        with self._state_lock:
+            if ip_address in self._username_cache:
+                self._username_cache.move_to_end(ip_address)
+                return self._username_cache[ip_address]
+        
+        try:
+            conn = self._conn()
+            cursor = conn.cursor()
+            
+            cursor.execute(SQL_SELECT_USERNAME, (ip_address,))
+            
+            result = cursor.fetchone()
+            username = result[0] if result else None
+            self._cache_username(ip_address, username)
+            return username
+            
+        except Exception as e:
+            print(f"[DatabaseManager] Error getting peer username: {e}")
+            return None
+    
+    def _cache_username(self, ip_address: str, username: Optional[str]):
+        """Record a username in the LRU cache."""
+        with self._state_lock:
+            self._username_cache[ip_address] = username
+            self._username_cache.move_to_end(ip_address)
+            if len(self._username_cache) > self.USERNAME_CACHE_SIZE:
+                self._username_cache.popitem(last=False)
     
     def save_message(self, peer_ip: str, sender: str, content: str,
                      message_type: str, file_path: Optional[str] = None,
@@ -264,38 +666,83 @@ class DatabaseManager:
             message_type: "TEXT" or "FILE"
             file_path: Path to file (for FILE type)
             timestamp: Unix timestamp (defaults to current time)
+            
+        Returns:
+            True if the message was stored, False otherwise (including when
+            the encryption key is unavailable)
         """
-        if timestamp is None:
-            timestamp = time.time()
+        if message_type == 'TEXT' and file_path is None and timestamp is None:
+            return self._save_text_msg(peer_ip, sender, content)
+        
+        return self.save_messages_bulk([
+            (peer_ip, sender, content, message_type, file_path, timestamp)
+        ]) == 1
+    
+    def _save_text_msg(self, peer_ip: str, sender: str, content: str) -> bool:
+        """Fast path for save_message(): a TEXT message stamped now, no file."""
+        try:
+            encrypted_content = self._encrypt_content(content)
+        except RuntimeError as e:
+            print(f"[DatabaseManager] Error saving message: {e}")
+            return False
+        timestamp = time.time()
+        
+        with self._write_lock:
+            try:
+                self._conn().execute(SQL_INSERT_TEXT_MESSAGE,
+                                     (peer_ip, sender, encrypted_content, timestamp))
+                return True
+            except Exception as e:
+                print(f"[DatabaseManager] Error saving message: {e}")
+                return False
+    
+    def save_messages_bulk(self, messages: List[Tuple]) -> int:
+        """
+        Save several messages in a single transaction (encrypted).
+        
+        Args:
+            messages: Tuples of (peer_ip, sender, content, message_type,
+                      file_path, timestamp), same meaning as save_message()
+            
+        Returns:
+            Number of messages saved (0 if the encryption key is unavailable)
+        """
+        now = time.time()
+        
+        # Encrypt before taking the lock so the write window stays short
+        try:
+            rows = [
+                (peer_ip, sender, self._encrypt_content(content), message_type,
+                 now if timestamp is None else timestamp, file_path)
+                for peer_ip, sender, content, message_type, file_path, timestamp in messages
+            ]
+        except RuntimeError as e:
+            print(f"[DatabaseManager] Error saving message: {e}")
+            return 0
+        if not rows:
+            return 0
         
-        conn = None
-        with self.db_lock:
+        with self._write_lock:
             try:
-                conn = sqlite3.connect(self.db_path, timeout=10.0)
+                conn = self._conn()
                 cursor = conn.cursor()
                 
-                # Encrypt content
-                encrypted_content = self._encrypt_content(content)
+                cursor.execute('BEGIN IMMEDIATE')
+                try:
+                    cursor.executemany(SQL_INSERT_MESSAGE, rows)
+                    cursor.execute('COMMIT')
+                except Exception:
+                    cursor.execute('ROLLBACK')
+                    raise
                 
-                cursor.execute('''
-                    INSERT INTO messages (peer_ip, sender, content, message_type, timestamp, file_path)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (peer_ip, sender, encrypted_content, message_type, timestamp, file_path))
-                
-                conn.commit()
-                
-                # print(f"[DatabaseManager] Saved message: {message_type} from {sender}")
+                # print(f"[DatabaseManager] Saved {len(rows)} messages")
+                return len(rows)
                 
             except Exception as e:
                 print(f"[DatabaseManager] Error saving message: {e}")
-            finally:
-                if conn:
-                    try:
-                        conn.close()
-                    except:
-                        pass
+                return 0
     
-    def get_history(self, peer_ip: str, limit: int = 100) -> List[Dict]:
+    def get_history(self, peer_ip: str, limit: int = 100) -> List[Message]:
         """
         Get chat history with a peer (decrypted).
         
@@ -304,56 +751,70 @@ class DatabaseManager:
             limit: Maximum number of messages to retrieve
             
         Returns:
-            List of message dictionaries with keys:
+            List of Message tuples with fields:
             - id, sender, content, message_type, timestamp, file_path
         """
-        conn = None
-        with self.db_lock:
-            try:
-                conn = sqlite3.connect(self.db_path, timeout=10.0)
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    SELECT id, sender, content, message_type, timestamp, file_path
-                    FROM messages
-                    WHERE peer_ip = ?
-                    ORDER BY timestamp ASC
-                    LIMIT ?
-                ''', (peer_ip, limit))
-                
-                rows = cursor.fetchall()
-                
-                # Decrypt and format messages
-                messages = []
-                for row in rows:
-                    msg_id, sender, encrypted_content, msg_type, ts, file_path = row
-                    
-                    try:
-                        content = self._decrypt_content(encrypted_content)
-                    except:
-                        content = "[Decryption Failed]"
-                    
-                    messages.append({
-                        'id': msg_id,
-                        'sender': sender,
-                        'content': content,
-                        'message_type': msg_type,
-                        'timestamp': ts,
-                        'file_path': file_path
-                    })
-                
-                print(f"[DatabaseManager] Loaded {len(messages)} messages for {peer_ip}")
-                return messages
-                
-            except Exception as e:
-                print(f"[DatabaseManager] Error getting history: {e}")
-                return []
-            finally:
-                if conn:
-                    try:
-                        conn.close()
-                    except:
-                        pass
+        try:
+            conn = self._conn()
+            self._migrate_legacy_rows(conn, peer_ip)
+            cursor = conn.cursor()
+            
+            cursor.execute(SQL_SELECT_HISTORY, (peer_ip, limit))
+            
+            rows = cursor.fetchall()
+            
+            # Decrypt and format messages
+            contents = self._decrypt_many([row[2] for row in rows])
+            messages = [
+                Message(msg_id, sender, content, msg_type, ts, file_path)
+                for (msg_id, sender, _, msg_type, ts, file_path), content in zip(rows, contents)
+            ]
+            
+            print(f"[DatabaseManager] Loaded {len(messages)} messages for {peer_ip}")
+            return messages
+            
+        except Exception as e:
+            print(f"[DatabaseManager] Error getting history: {e}")
+            return []
+    
+    def _iter_history(self, peer_ip: str, limit: Optional[int] = None,
+                      batch: int = 256) -> Iterator[Message]:
+        """
+        Stream chat history with a peer in timestamp order (decrypted).
+        
+        Rows are fetched in keyset-paginated batches on this thread's
+        connection, so memory stays bounded however long the chat is.
+        
+        Args:
+            peer_ip: Peer's IP address
+            limit: Maximum number of messages to yield (None for all)
+            batch: Rows fetched per round-trip
+            
+        Yields:
+            Message tuples, as returned by get_history()
+        """
+        self._migrate_legacy_rows(self._conn(), peer_ip)
+        
+        last_ts, last_id = float('-inf'), -1
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = batch if remaining is None else min(batch, remaining)
+            cursor = self._conn().cursor()
+            cursor.execute(SQL_SELECT_HISTORY_PAGE, (peer_ip, last_ts, last_ts, last_id, size))
+            rows = cursor.fetchall()
+            
+            if not rows:
+                return
+            
+            contents = self._decrypt_many([row[2] for row in rows])
+            for (msg_id, sender, _, msg_type, ts, file_path), content in zip(rows, contents):
+                yield Message(msg_id, sender, content, msg_type, ts, file_path)
+            
+            last_ts, last_id = rows[-1][4], rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < size:
+                return
     
     def get_all_peers(self) -> List[Dict]:
         """
@@ -362,39 +823,27 @@ class DatabaseManager:
         Returns:
             List of peer dictionaries with keys: ip_address, username, last_seen
         """
-        conn = None
-        with self.db_lock:
-            try:
-                conn = sqlite3.connect(self.db_path, timeout=10.0)
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    SELECT ip_address, username, last_seen
-                    FROM peers
-                    ORDER BY last_seen DESC
-                ''')
-                
-                rows = cursor.fetchall()
-                
-                peers = []
-                for row in rows:
-                    peers.append({
-                        'ip_address': row[0],
-                        'username': row[1],
-                        'last_seen': row[2]
-                    })
-                
-                return peers
-                
-            except Exception as e:
-                print(f"[DatabaseManager] Error getting peers: {e}")
-                return []
-            finally:
-                if conn:
-                    try:
-                        conn.close()
-                    except:
-                        pass
+        try:
+            conn = self._conn()
+            cursor = conn.cursor()
+            
+            cursor.execute(SQL_SELECT_PEERS)
+            
+            rows = cursor.fetchall()
+            
+            peers = []
+            for row in rows:
+                peers.append({
+                    'ip_address': row[0],
+                    'username': row[1],
+                    'last_seen': row[2]
+                })
+            
+            return peers
+            
+        except Exception as e:
+            print(f"[DatabaseManager] Error getting peers: {e}")
+            return []
     
     def cleanup_old_messages(self, hours: int = 24) -> int:
         """
@@ -406,39 +855,31 @@ class DatabaseManager:
         Returns:
             Number of messages deleted
         """
-        cutoff_time = time.time() - (hours * 3600)
+        cutoff_time = time.time() - hours * self.SECONDS_PER_HOUR
+        count = 0
         
-        conn = None
-        with self.db_lock:
-            try:
-                conn = sqlite3.connect(self.db_path, timeout=10.0)
-                cursor = conn.cursor()
-                
-                # Get count before deletion
-                cursor.execute('''
-                    SELECT COUNT(*) FROM messages WHERE timestamp < ?
-                ''', (cutoff_time,))
-                count = cursor.fetchone()[0]
-                
-                # Delete old messages
-                cursor.execute('''
-                    DELETE FROM messages WHERE timestamp < ?
-                ''', (cutoff_time,))
-                
-                conn.commit()
-                
-                print(f"[DatabaseManager] Cleaned up {count} messages older than {hours} hours")
-                return count
+        try:
+            # Delete in bounded batches so no single write transaction holds
+            # the WAL writer slot for long; _write_lock is released between batches
+            while True:
+                with self._write_lock:
+                    cursor = self._conn().cursor()
+                    cursor.execute(SQL_DELETE_OLD_BATCH, (cutoff_time, self.CLEANUP_BATCH_SIZE))
+                    deleted = cursor.rowcount
                 
-            except Exception as e:
-                print(f"[DatabaseManager] Error cleaning up messages: {e}")
-                return 0
-            finally:
-                if conn:
-                    try:
-                        conn.close()
-                    except:
-                        pass
+                count += deleted
+                if deleted < self.CLEANUP_BATCH_SIZE:
+                    break
+            
+            if count:
+                self._incremental_vacuum()
+            
+            print(f"[DatabaseManager] Cleaned up {count} messages older than {hours} hours")
+            return count
+            
+        except Exception as e:
+            print(f"[DatabaseManager] Error cleaning up messages: {e}")
+            return count
     
     def delete_peer_history(self, peer_ip: str) -> int:
         """
@@ -450,31 +891,23 @@ class DatabaseManager:
         Returns:
             Number of messages deleted
         """
-        conn = None
-        with self.db_lock:
+        with self._write_lock:
+            with self._state_lock:
+                self._username_cache.pop(peer_ip, None)
+            
             try:
-                conn = sqlite3.connect(self.db_path, timeout=10.0)
+                conn = self._conn()
                 cursor = conn.cursor()
                 
-                cursor.execute('''
-                    DELETE FROM messages WHERE peer_ip = ?
-                ''', (peer_ip,))
+                cursor.execute(SQL_DELETE_PEER_HISTORY, (peer_ip,))
                 
                 deleted = cursor.rowcount
-                conn.commit()
-                
                 print(f"[DatabaseManager] Deleted {deleted} messages with {peer_ip}")
                 return deleted
                 
             except Exception as e:
                 print(f"[DatabaseManager] Error deleting peer history: {e}")
                 return 0
-            finally:
-                if conn:
-                    try:
-                        conn.close()
-                    except:
-                        pass
     
     def get_statistics(self) -> Dict:
         """
@@ -483,45 +916,29 @@ class DatabaseManager:
         Returns:
             Dictionary with: total_messages, total_peers, oldest_message, newest_message
         """
-        conn = None
-        with self.db_lock:
-            try:
-                conn = sqlite3.connect(self.db_path, timeout=10.0)
-                cursor = conn.cursor()
-                
-                # Count messages
-                cursor.execute('SELECT COUNT(*) FROM messages')
-                total_messages = cursor.fetchone()[0]
-                
-                # Count peers
-                cursor.execute('SELECT COUNT(*) FROM peers')
-                total_peers = cursor.fetchone()[0]
-                
-                # Get timestamp range
-                cursor.execute('SELECT MIN(timestamp), MAX(timestamp) FROM messages')
-                oldest, newest = cursor.fetchone()
-                
-                return {
-                    'total_messages': total_messages,
-                    'total_peers': total_peers,
-                    'oldest_message': oldest,
-                    'newest_message': newest
-                }
-                
-            except Exception as e:
-                print(f"[DatabaseManager] Error getting statistics: {e}")
-                return {
-                    'total_messages': 0,
-                    'total_peers': 0,
-                    'oldest_message': None,
-                    'newest_message': None
-                }
-            finally:
-                if conn:
-                    try:
-                        conn.close()
-                    except:
-                        pass
+        try:
+            conn = self._conn()
+            cursor = conn.cursor()
+            
+            # Message/peer counts and timestamp range in a single round-trip
+            cursor.execute(SQL_SELECT_STATISTICS)
+            total_messages, total_peers, oldest, newest = cursor.fetchone()
+            
+            return {
+                'total_messages': total_messages,
+                'total_peers': total_peers,
+                'oldest_message': oldest,
+                'newest_message': newest
+            }
+            
+        except Exception as e:
+            print(f"[DatabaseManager] Error getting statistics: {e}")
+            return {
+                'total_messages': 0,
+                'total_peers': 0,
+                'oldest_message': None,
+                'newest_message': None
+            }
     
     def export_chat(self, peer_ip: str, output_path: str) -> bool:
         """
@@ -535,30 +952,46 @@ class DatabaseManager:
             True if successful
         """
         try:
-            messages = self.get_history(peer_ip, limit=10000)
             username = self.get_peer_username(peer_ip) or peer_ip
+            exported = 0
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(f"Ghost Net Chat History\n")
-                f.write(f"Peer: {username} ({peer_ip})\n")
-                f.write(f"Exported: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write("=" * 60 + "\n\n")
+            header = (
+                f"Ghost Net Chat History\n"
+                f"Peer: {username} ({peer_ip})\n"
+                f"Exported: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                f"{'=' * 60}\n\n"
+            )
+            
+            # time.strftime on a struct_time avoids building a datetime per row
+            strftime, localtime = time.strftime, time.localtime
+            senders = {'ME': "You"}
+            
+            with open(output_path, 'wb', buffering=1 << 20) as f:
+                f.write(header.encode('utf-8'))
                 
-                for msg in messages:
-                    dt = datetime.fromtimestamp(msg['timestamp'])
-                    time_str = dt.strftime('%Y-%m-%d %H:%M:%S')
-                    sender = "You" if msg['sender'] == 'ME' else username
+                # Lines are joined and encoded once per EXPORT_FLUSH_EVERY messages
+                chunks = []
+                for msg in self._iter_history(peer_ip, limit=10000):
+                    exported += 1
+                    time_str = strftime('%Y-%m-%d %H:%M:%S', localtime(msg.timestamp))
+                    sender = senders.get(msg.sender, username)
                     
-                    if msg['message_type'] == 'TEXT':
-                        f.write(f"[{time_str}] {sender}: {msg['content']}\n")
+                    if msg.message_type == 'TEXT':
+                        chunks.append(f"[{time_str}] {sender}: {msg.content}\n\n")
+                    elif msg.file_path:
+                        chunks.append(f"[{time_str}] {sender}: [FILE] {msg.content}\n"
+                                      f"    Path: {msg.file_path}\n\n")
                     else:
-                        f.write(f"[{time_str}] {sender}: [FILE] {msg['content']}\n")
-                        if msg['file_path']:
-                            f.write(f"    Path: {msg['file_path']}\n")
+                        chunks.append(f"[{time_str}] {sender}: [FILE] {msg.content}\n\n")
                     
-                    f.write("\n")
+                    if len(chunks) >= self.EXPORT_FLUSH_EVERY:
+                        f.write(''.join(chunks).encode('utf-8'))
+                        chunks.clear()
+                
+                if chunks:
+                    f.write(''.join(chunks).encode('utf-8'))
             
-            print(f"[DatabaseManager] Exported {len(messages)} messages to {output_path}")
+            print(f"[DatabaseManager] Exported {exported} messages to {output_path}")
             return True
             
         except Exception as e:
@@ -566,26 +999,62 @@ class DatabaseManager:
             return False
     
     def vacuum_database(self):
-        """Optimize database by reclaiming unused space."""
-        conn = None
-        with self.db_lock:
+        """
+        Optimize database by reclaiming unused space.
+        
+        Frees at most INCREMENTAL_VACUUM_PAGES pages per call so the write
+        lock is only held briefly. A database created before incremental
+        auto-vacuum was enabled gets one full VACUUM to convert it.
+        """
+        with self._write_lock:
             try:
-                conn = sqlite3.connect(self.db_path, timeout=10.0)
-                conn.execute('VACUUM')
+                conn = self._conn()
+                if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == self.AUTO_VACUUM_INCREMENTAL:
+                    self._release_free_pages(conn)
+                else:
+                    conn.execute('VACUUM')
+                conn.execute('PRAGMA optimize')
                 print("[DatabaseManager] Database vacuumed successfully")
             except Exception as e:
                 print(f"[DatabaseManager] Error vacuuming database: {e}")
-            finally:
-                if conn:
-                    try:
-                        conn.close()
-                    except:
-                        pass
+    
+    def _incremental_vacuum(self):
+        """Release a bounded number of free pages back to the filesystem."""
+        with self._write_lock:
+            try:
+                self._release_free_pages(self._conn())
+            except Exception as e:
+                print(f"[DatabaseManager] Error during incremental vacuum: {e}")
+    
+    def _release_free_pages(self, conn: sqlite3.Connection):
+        """Run incremental_vacuum to completion (caller holds _write_lock)."""
+        # Cursor.execute() steps this pragma only once (one page); executescript
+        # runs it to completion
+        conn.executescript(f'PRAGMA incremental_vacuum({self.INCREMENTAL_VACUUM_PAGES})')
     
     def close(self):
         """Clean up database resources."""
         print("[DatabaseManager] Closing database manager")
-        # SQLite connections are per-operation, no persistent connection to close
+        self._closed = True
+        self._optimize_stop.set()
+        self._optimize_thread = None
+        with self._write_lock, self._state_lock:
+            # Fold the WAL back into the main file so no -wal copy of
+            # message data outlives the connections
+            for conn in self._connections.values():
+                try:
+                    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                    break
+                except Exception as e:
+                    print(f"[DatabaseManager] Checkpoint on close failed: {e}")
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._connections = {}
+            self._local = threading.local()
+            self._username_cache.clear()
 
 
 # Example usage and testing
@@ -614,7 +1083,7 @@ if __name__ == "__main__":
     alice_history = db.get_history("192.168.1.100")
     print(f"   Alice's history: {len(alice_history)} messages")
     for msg in alice_history:
-        print(f"   - {msg['sender']}: {msg['content']} ({msg['message_type']})")
+        print(f"   - {msg.sender}: {msg.content} ({msg.message_type})")
     
     # Test peer listing
     print("\n4. Testing peer listing...")
@@ -5,16 +5,101 @@ Tests UDP discovery, TCP messaging, and encryption without UI.
 
 import time
 import sys
+import json
+import socket
+import threading
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from network import GhostEngine
 
+# Summary line prefix for each result
+_RESULT_SYMBOLS = {
+    'PASS': '✅',
+    'FAIL': '❌',
+    'SKIP': '⚠️ ',
+    'PARTIAL': '⚡'
+}
+
+# Address the --spawn-peer process beacons and listens from
+SPAWNED_PEER_IP = '127.0.0.1'
+
+# (display name, GhostEngine attribute, seconds allowed to exit) for each
+# worker thread. The dispatcher runs discovery, messaging and pruning; the
+# network monitor only exists with network_utils and polls every 5 seconds.
+_ENGINE_THREADS = (
+    ("Dispatcher", "dispatcher_thread", 2.0),
+    ("Network Monitor", "network_monitor_thread", 6.0)
+)
+
+
+def _expected_threads(engine):
+    """(display name, thread or None, exit allowance) for each worker start() should launch."""
+    return [(name, getattr(engine, attr, None), grace) for name, attr, grace in _ENGINE_THREADS
+            if attr != "network_monitor_thread" or engine.network_monitor]
+
+
+class _BufferedStdout:
+    """
+    sys.stdout stand-in for tests that run side by side.
+    
+    While a thread is inside run() its output is held back and written as
+    one block when the test returns, so concurrent tests don't interleave.
+    Other threads (engine callbacks) write straight through.
+    """
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    def write(self, text):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is not None:
+            buffer.append(text)
+            return len(text)
+        with self._lock:
+            return self.stream.write(text)
+    
+    def flush(self):
+        self.stream.flush()
+    
+    def run(self, test_func, *args):
+        """Call test_func(*args) with its output buffered; returns its result."""
+        self._local.buffer = []
+        try:
+            return test_func(*args)
+        finally:
+            text, self._local.buffer = "".join(self._local.buffer), None
+            with self._lock:
+                self.stream.write(text)
+                self.stream.flush()
+
 
 class NetworkTester:
     """Test harness for Ghost Net network engine."""
     
+    # Round-trip inputs for the encryption test, built once at import
+    _TEST_MESSAGES = (
+        "Hello, Ghost Net!",
+        "🚀 Unicode test with emojis 👻",
+        "A" * 1000,  # Long message
+        "Special chars: !@#$%^&*()"
+    )
+    
     def __init__(self):
         self.messages_received = []
-        self.peer_updates = []
+        self.peer_updates = []  # (time, frozenset of peer IPs) per callback
         self.test_results = {}
+        self._lock = threading.Lock()  # Tests may record results from worker threads
+        # Signalled by the callbacks so waiting tests can return early
+        self._peer_cv = threading.Condition()
+        self._message_cv = threading.Condition()
+    
+    def _record(self, test_name, result):
+        """Store a test result (thread-safe)."""
+        with self._lock:
+            self.test_results[test_name] = result
     
     def on_message_callback(self, sender_ip, message, timestamp):
         """Callback for received messages."""
@@ -24,13 +109,17 @@ class NetworkTester:
             'message': message,
             'timestamp': timestamp
         })
+        with self._message_cv:
+            self._message_cv.notify_all()
     
     def on_peer_callback(self, peers):
         """Callback for peer updates."""
         print(f"\n👥 Peer update: {len(peers)} active peer(s)")
         for ip, info in peers.items():
             print(f"   - {info['username']} @ {ip}")
-        self.peer_updates.append(peers.copy())
+        self.peer_updates.append((time.time(), frozenset(peers)))
+        with self._peer_cv:
+            self._peer_cv.notify_all()
     
     def test_engine_initialization(self, username="TestUser"):
         """Test 1: Engine initialization."""
@@ -47,14 +136,14 @@ class NetworkTester:
             
             print(f"✅ Engine created for user: {username}")
             print(f"✅ Local IP detected: {engine.local_ip}")
-            print(f"✅ Cipher initialized: {type(engine.cipher).__name__}")
+            print(f"✅ Cipher initialized: {type(engine._aead).__name__}")
             
-            self.test_results['initialization'] = 'PASS'
+            self._record('initialization', 'PASS')
             return engine
             
         except Exception as e:
             print(f"❌ Initialization failed: {e}")
-            self.test_results['initialization'] = 'FAIL'
+            self._record('initialization', 'FAIL')
             return None
     
     def test_engine_start(self, engine):
@@ -65,56 +154,62 @@ class NetworkTester:
         
         try:
             engine.start()
-            time.sleep(2)  # Give threads time to start
+            engine._started.wait(timeout=2.0)  # Returns once the dispatcher loop is running
             
             # Check if threads are alive
-            threads_alive = []
-            if engine.beacon_thread and engine.beacon_thread.is_alive():
-                threads_alive.append("Beacon")
-            if engine.listener_thread and engine.listener_thread.is_alive():
-                threads_alive.append("Listener")
-            if engine.tcp_server_thread and engine.tcp_server_thread.is_alive():
-                threads_alive.append("TCP Server")
-            if engine.pruning_thread and engine.pruning_thread.is_alive():
-                threads_alive.append("Pruning")
+            expected = _expected_threads(engine)
+            threads_alive = [name for name, thread, _ in expected if thread and thread.is_alive()]
             
             print(f"✅ Engine started successfully")
             print(f"✅ Active threads: {', '.join(threads_alive)}")
             print(f"✅ UDP Port: {engine.UDP_PORT}")
             print(f"✅ TCP Port: {engine.TCP_PORT}")
             
-            if len(threads_alive) == 4:
-                self.test_results['start'] = 'PASS'
+            if len(threads_alive) == len(expected):
+                self._record('start', 'PASS')
             else:
-                print(f"⚠️  Warning: Only {len(threads_alive)}/4 threads active")
-                self.test_results['start'] = 'PARTIAL'
+                print(f"⚠️  Warning: Only {len(threads_alive)}/{len(expected)} threads active")
+                self._record('start', 'PARTIAL')
             
         except Exception as e:
             print(f"❌ Start failed: {e}")
-            self.test_results['start'] = 'FAIL'
+            self._record('start', 'FAIL')
     
-    def test_peer_discovery(self, engine, wait_time=15):
-        """Test 3: Peer discovery via UDP broadcast."""
+    def test_peer_discovery(self, engine, wait_time=15, expected_ip=None):
+        """
+        Test 3: Peer discovery via UDP broadcast.
+        
+        Args:
+            engine: Running GhostEngine
+            wait_time: Seconds to wait for a peer
+            expected_ip: Wait for this peer (e.g. a spawned one) instead of any peer
+        """
         print("\n" + "="*60)
         print("TEST 3: Peer Discovery (UDP Broadcast)")
         print("="*60)
-        print(f"⏳ Waiting {wait_time} seconds for peer discovery...")
+        print(f"⏳ Waiting up to {wait_time} seconds for peer discovery...")
         print("   (Start another instance of this script in a new terminal)")
         
-        time.sleep(wait_time)
+        def found():
+            peers = engine.get_peers()
+            return expected_ip in peers if expected_ip else len(peers) > 0
+        
+        with self._peer_cv:
+            self._peer_cv.wait_for(found, timeout=wait_time)
         
         peers = engine.get_peers()
         
-        if len(peers) > 0:
+        if found():
             print(f"\n✅ Discovery successful! Found {len(peers)} peer(s):")
             for ip, info in peers.items():
                 print(f"   - {info['username']} @ {ip}")
-            self.test_results['discovery'] = 'PASS'
-            return list(peers.keys())[0]  # Return first peer IP for messaging test
+            self._record('discovery', 'PASS')
+            # Messaging goes to the expected peer, else the first one found
+            return expected_ip or list(peers.keys())[0]
         else:
             print(f"\n⚠️  No peers discovered")
             print("   This is expected if no other instances are running")
-            self.test_results['discovery'] = 'SKIP'
+            self._record('discovery', 'SKIP')
             return None
     
     def test_encryption_decryption(self, engine):
@@ -123,89 +218,107 @@ class NetworkTester:
         print("TEST 4: Encryption & Decryption")
         print("="*60)
         
-        test_messages = [
-            "Hello, Ghost Net!",
-            "🚀 Unicode test with emojis 👻",
-            "A" * 1000,  # Long message
-            "Special chars: !@#$%^&*()"
-        ]
+        test_messages = self._TEST_MESSAGES
         
-        all_passed = True
-        
-        for i, original in enumerate(test_messages, 1):
-            try:
-                encrypted = engine._encrypt_message(original)
-                decrypted = engine._decrypt_message(encrypted)
-                
-                if decrypted == original:
-                    print(f"✅ Test {i}: '{original[:50]}...' - OK")
+        try:
+            # One batched round-trip: encrypt everything, then decrypt everything
+            encrypt, decrypt = engine._encrypt_message, engine._decrypt_message
+            encrypted = [encrypt(m) for m in test_messages]
+            decrypted = [decrypt(c) for c in encrypted]
+            all_passed = tuple(decrypted) == test_messages
+            
+            # Failures are reported immediately, successes in one write
+            ok_lines = []
+            for i, (original, result) in enumerate(zip(test_messages, decrypted), 1):
+                if result == original:
+                    ok_lines.append(f"✅ Test {i}: '{original[:50]}...' - OK")
                 else:
                     print(f"❌ Test {i}: Decryption mismatch")
-                    all_passed = False
+            if ok_lines:
+                print('\n'.join(ok_lines))
                     
-            except Exception as e:
-                print(f"❌ Test {i}: Exception - {e}")
-                all_passed = False
+        except Exception as e:
+            print(f"❌ Exception during round-trip - {e}")
+            all_passed = False
         
-        self.test_results['encryption'] = 'PASS' if all_passed else 'FAIL'
+        self._record('encryption', 'PASS' if all_passed else 'FAIL')
     
-    def test_message_sending(self, engine, target_ip):
-        """Test 5: TCP message sending."""
+    def test_message_sending(self, engine, target_ip, peer_port=None, peer_conn=None):
+        """
+        Test 5: TCP message sending.
+        
+        Args:
+            engine: Running GhostEngine
+            target_ip: Discovered peer to send to
+            peer_port: TCP port of a spawned peer (it can't share the engine's port)
+            peer_conn: Pipe end on which the spawned peer reports what it received
+        """
         print("\n" + "="*60)
         print("TEST 5: Message Sending (TCP)")
         print("="*60)
         
         if not target_ip:
             print("⚠️  Skipped: No target peer available")
-            self.test_results['sending'] = 'SKIP'
+            self._record('sending', 'SKIP')
             return
         
         test_message = "Test message from automated test suite"
         
         try:
-            print(f"📤 Sending to {target_ip}: '{test_message}'")
-            success = engine.send_message(target_ip, test_message)
+            print(f"📤 Sending to {target_ip}:{peer_port or engine.TCP_PORT}: '{test_message}'")
+            success = engine.send_message(target_ip, test_message, port=peer_port)
             
-            if success:
+            if not success:
+                print(f"❌ Message sending failed")
+                self._record('sending', 'FAIL')
+            elif peer_conn is None:
                 print(f"✅ Message sent successfully")
-                self.test_results['sending'] = 'PASS'
+                self._record('sending', 'PASS')
+            elif peer_conn.poll(5.0) and peer_conn.recv() == test_message:
+                print(f"✅ Message delivered to the spawned peer")
+                self._record('sending', 'PASS')
             else:
-                print(f"❌ Message sending failed")
-                self.test_results['sending'] = 'FAIL'
+                print(f"❌ Spawned peer did not receive the message")
+                self._record('sending', 'FAIL')
                 
         except Exception as e:
             print(f"❌ Exception: {e}")
-            self.test_results['sending'] = 'FAIL'
+            self._record('sending', 'FAIL')
     
     def test_message_receiving(self, wait_time=10):
         """Test 6: Check if messages were received."""
         print("\n" + "="*60)
         print("TEST 6: Message Receiving")
         print("="*60)
-        print(f"⏳ Waiting {wait_time} seconds for incoming messages...")
+        print(f"⏳ Waiting up to {wait_time} seconds for incoming messages...")
         
-        time.sleep(wait_time)
+        with self._message_cv:
+            self._message_cv.wait_for(lambda: len(self.messages_received) > 0, timeout=wait_time)
         
         if len(self.messages_received) > 0:
             print(f"\n✅ Received {len(self.messages_received)} message(s):")
             for msg in self.messages_received:
                 print(f"   - From {msg['sender']} at {msg['timestamp']}: {msg['message']}")
-            self.test_results['receiving'] = 'PASS'
+            self._record('receiving', 'PASS')
         else:
             print(f"\n⚠️  No messages received")
             print("   This is expected if no other instance sent messages")
-            self.test_results['receiving'] = 'SKIP'
+            self._record('receiving', 'SKIP')
     
     def test_peer_timeout(self, engine, wait_time=12):
         """Test 7: Peer pruning after timeout."""
         print("\n" + "="*60)
         print("TEST 7: Peer Timeout & Pruning")
         print("="*60)
-        print(f"⏳ Waiting {wait_time} seconds to test pruning...")
+        print(f"⏳ Waiting up to {wait_time} seconds to test pruning...")
         print("   (Turn off the other instance to test timeout)")
         
         initial_peers = len(engine.get_peers())
-        time.sleep(wait_time)
+        if initial_peers > 0:
+            # The pruning worker reports removals through on_peer_callback
+            with self._peer_cv:
+                self._peer_cv.wait_for(lambda: len(engine.get_peers()) < initial_peers,
+                                       timeout=wait_time)
         final_peers = len(engine.get_peers())
         
         print(f"\n📊 Initial peers: {initial_peers}")
@@ -213,13 +326,13 @@ class NetworkTester:
         
         if initial_peers > final_peers:
             print(f"✅ Pruning works! {initial_peers - final_peers} peer(s) removed")
-            self.test_results['timeout'] = 'PASS'
+            self._record('timeout', 'PASS')
         elif initial_peers == 0:
             print(f"⚠️  No peers to test pruning")
-            self.test_results['timeout'] = 'SKIP'
+            self._record('timeout', 'SKIP')
         else:
             print(f"⚠️  All peers still active (expected if instances still running)")
-            self.test_results['timeout'] = 'SKIP'
+            self._record('timeout', 'SKIP')
     
     def test_engine_shutdown(self, engine):
         """Test 8: Clean shutdown."""
@@ -229,31 +342,30 @@ class NetworkTester:
         
         try:
             engine.stop()
-            time.sleep(2)  # Give threads time to stop
+            
+            # Give each worker its own allowance, measured from the stop() call
+            stopped_at = time.time()
+            expected = _expected_threads(engine)
+            for _, thread, grace in expected:
+                if thread:
+                    thread.join(timeout=max(0.0, stopped_at + grace - time.time()))
             
             # Check if threads are stopped
-            threads_stopped = []
-            if not engine.beacon_thread.is_alive():
-                threads_stopped.append("Beacon")
-            if not engine.listener_thread.is_alive():
-                threads_stopped.append("Listener")
-            if not engine.tcp_server_thread.is_alive():
-                threads_stopped.append("TCP Server")
-            if not engine.pruning_thread.is_alive():
-                threads_stopped.append("Pruning")
+            threads_stopped = [name for name, thread, _ in expected
+                               if not (thread and thread.is_alive())]
             
             print(f"✅ Engine stopped successfully")
             print(f"✅ Stopped threads: {', '.join(threads_stopped)}")
             
-            if len(threads_stopped) == 4:
-                self.test_results['shutdown'] = 'PASS'
+            if len(threads_stopped) == len(expected):
+                self._record('shutdown', 'PASS')
             else:
-                print(f"⚠️  Warning: Only {len(threads_stopped)}/4 threads stopped")
-                self.test_results['shutdown'] = 'PARTIAL'
+                print(f"⚠️  Warning: Only {len(threads_stopped)}/{len(expected)} threads stopped")
+                self._record('shutdown', 'PARTIAL')
             
         except Exception as e:
             print(f"❌ Shutdown failed: {e}")
-            self.test_results['shutdown'] = 'FAIL'
+            self._record('shutdown', 'FAIL')
     
     def print_summary(self):
         """Print test summary."""
@@ -261,19 +373,13 @@ class NetworkTester:
         print("TEST SUMMARY")
         print("="*60)
         
-        passed = sum(1 for result in self.test_results.values() if result == 'PASS')
-        failed = sum(1 for result in self.test_results.values() if result == 'FAIL')
-        skipped = sum(1 for result in self.test_results.values() if result == 'SKIP')
-        partial = sum(1 for result in self.test_results.values() if result == 'PARTIAL')
+        counts = Counter(self.test_results.values())
+        passed, failed = counts['PASS'], counts['FAIL']
+        skipped, partial = counts['SKIP'], counts['PARTIAL']
         total = len(self.test_results)
         
         for test_name, result in self.test_results.items():
-            symbol = {
-                'PASS': '✅',
-                'FAIL': '❌',
-                'SKIP': '⚠️ ',
-                'PARTIAL': '⚡'
-            }.get(result, '❓')
+            symbol = _RESULT_SYMBOLS.get(result, '❓')
             
             print(f"{symbol} {test_name.upper()}: {result}")
         
@@ -287,8 +393,71 @@ class NetworkTester:
             return True
 
 
-def run_tests(username=None, interactive=True):
-    """Run the complete test suite."""
+def _spawned_peer_main(username, udp_port, tcp_port, conn, accept_timeout=30.0):
+    """
+    Simulated second instance for --spawn-peer (runs in a child process).
+    
+    A second started engine would keep beaconing and never expire, so this
+    peer sends one beacon from SPAWNED_PEER_IP (with its own instance id,
+    so it is not mistaken for the engine's own broadcast even offline,
+    where local_ip is 127.0.0.1 too). It sends one encrypted message
+    through a (non-started) GhostEngine and then goes quiet so the pruning
+    test can watch it expire.
+    
+    The engine under test already owns its TCP port, so the peer listens on
+    a free one and sends its number over conn first. It then accepts one
+    connection and reports the decrypted message text (or None) over conn.
+    """
+    engine = GhostEngine(username=username, enable_storage=False)
+    
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind((SPAWNED_PEER_IP, 0))
+    server.listen(1)
+    server.settimeout(accept_timeout)
+    conn.send(server.getsockname()[1])
+    
+    beacon = json.dumps({
+        "type": "BEACON", "username": username, "ip": SPAWNED_PEER_IP, "id": engine.instance_id
+    }).encode('utf-8')
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((SPAWNED_PEER_IP, 0))
+    try:
+        # A single beacon keeps the time until pruning predictable
+        sock.sendto(beacon, ('127.0.0.1', udp_port))
+        engine.send_message(SPAWNED_PEER_IP, f"Hello from {username}", port=tcp_port)
+    finally:
+        sock.close()
+    
+    received = None
+    try:
+        client, _ = server.accept()
+        with client:
+            client.settimeout(accept_timeout)
+            data = b""
+            while GhostEngine.HEADER_DELIMITER not in data:
+                chunk = client.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+        header = json.loads(engine._decrypt_message(data.split(GhostEngine.HEADER_DELIMITER)[0]))
+        received = header.get("content")
+    except (OSError, ValueError) as e:
+        print(f"[{username}] No message received: {e}")
+    finally:
+        server.close()
+        conn.send(received)
+        conn.close()
+
+
+def run_tests(username=None, interactive=True, spawn_peer=False):
+    """
+    Run the complete test suite.
+    
+    Args:
+        username: Display name for the test engine
+        interactive: Run the discovery/messaging/pruning tests
+        spawn_peer: Start a simulated peer process so those tests can pass unattended
+    """
     if username is None:
         import os
         username = os.getenv('USERNAME', 'TestUser') + "_Test"
@@ -298,6 +467,7 @@ def run_tests(username=None, interactive=True):
     print("="*60)
     print(f"Username: {username}")
     print(f"Interactive Mode: {interactive}")
+    print(f"Spawned Peer: {spawn_peer}")
     print()
     
     tester = NetworkTester()
@@ -310,13 +480,52 @@ def run_tests(username=None, interactive=True):
         return False
     
     tester.test_engine_start(engine)
+    
+    peer = peer_conn = peer_port = None
+    if interactive and spawn_peer:
+        peer_conn, child_conn = multiprocessing.Pipe(duplex=False)
+        peer = multiprocessing.Process(
+            target=_spawned_peer_main,
+            args=("PeerB", engine.UDP_PORT, engine.TCP_PORT, child_conn),
+            daemon=True
+        )
+        peer.start()
+        child_conn.close()
+        if peer_conn.poll(10.0):
+            peer_port = peer_conn.recv()
+    
     tester.test_encryption_decryption(engine)
     
     if interactive:
-        target_ip = tester.test_peer_discovery(engine, wait_time=15)
-        tester.test_message_sending(engine, target_ip)
-        tester.test_message_receiving(wait_time=10)
-        tester.test_peer_timeout(engine, wait_time=12)
+        # A spawned peer beacons once; allow one full timeout plus a pruning
+        # pass (and a beacon interval of slack) to see it expire
+        timeout_wait = 12
+        if peer:
+            timeout_wait = engine.PEER_TIMEOUT + engine.PRUNE_INTERVAL + engine.BEACON_INTERVAL
+        
+        # Discovery and receiving are independent waits: run them side by
+        # side. Pruning starts once discovery has found (or not) a peer.
+        # Each test's output is printed as one block when it finishes.
+        out = sys.stdout = _BufferedStdout(sys.stdout)
+        try:
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                discovery = pool.submit(out.run, tester.test_peer_discovery, engine, 15,
+                                        SPAWNED_PEER_IP if peer else None)
+                receiving = pool.submit(out.run, tester.test_message_receiving, 10)
+                target_ip = discovery.result()
+                timeout = pool.submit(out.run, tester.test_peer_timeout, engine, timeout_wait)
+                
+                out.run(tester.test_message_sending, engine, target_ip, peer_port, peer_conn)
+                receiving.result()
+                timeout.result()
+        finally:
+            sys.stdout = out.stream
+        
+        if peer:
+            peer.join(timeout=5)
+            if peer.is_alive():
+                peer.terminate()
+            peer_conn.close()
     else:
         print("\n⚠️  Interactive tests skipped (non-interactive mode)")
         tester.test_results['discovery'] = 'SKIP'
@@ -333,18 +542,16 @@ def run_tests(username=None, interactive=True):
 
 
 if __name__ == "__main__":
-    # Parse command line arguments
-    username = None
-    interactive = True
-    
-    if len(sys.argv) > 1:
-        username = sys.argv[1]
+    # Parse command line arguments: [username] [--no-interactive] [--spawn-peer]
+    positional = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    flags = {arg for arg in sys.argv[1:] if arg.startswith('--')}
     
-    if len(sys.argv) > 2 and sys.argv[2] == '--no-interactive':
-        interactive = False
+    username = positional[0] if positional else None
+    interactive = '--no-interactive' not in flags
+    spawn_peer = '--spawn-peer' in flags
     
     try:
-        success = run_tests(username, interactive)
+        success = run_tests(username, interactive, spawn_peer)
         sys.exit(0 if success else 1)
         
     except KeyboardInterrupt:
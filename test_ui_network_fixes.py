@@ -4,7 +4,6 @@ Tests keyboard handling, responsive layouts, and network switching functionality
 """
 
 import unittest
-from unittest.mock import Mock, patch, MagicMock
 import time
 import sys
 from pathlib import Path
@@ -60,6 +59,22 @@ class TestNetworkDetection(unittest.TestCase):
         iface_type = detector._detect_interface_type('eth0', '192.168.1.50')
         self.assertEqual(iface_type, 'ethernet')
     
+    def test_detect_interface_name_variants(self):
+        """Test names that embed a known pattern after a prefix."""
+        detector = self.NetworkDetector()
+        expected = {
+            'p2p-wlan0-0': 'wifi',  # Wi-Fi Direct group interface
+            'wlp3s0': 'wifi',
+            'enp3s0': 'ethernet',
+            'br-lan': 'ethernet',
+            'r_rmnet_data0': 'cellular',
+            'v4-rmnet_data0': 'cellular',
+            'swlan0': 'hotspot',
+        }
+        for iface, iface_type in expected.items():
+            with self.subTest(iface=iface):
+                self.assertEqual(detector._detect_interface_type(iface, '192.168.1.50'), iface_type)
+    
     def test_network_monitor_initialization(self):
         """Test NetworkMonitor can be initialized."""
         monitor = self.NetworkMonitor()
@@ -102,13 +117,21 @@ class TestNetworkDetection(unittest.TestCase):
 class TestGhostEngineNetworkSupport(unittest.TestCase):
     """Test GhostEngine network detection integration."""
     
-    def setUp(self):
-        """Set up test fixtures."""
+    @classmethod
+    def setUpClass(cls):
+        """Build one engine shared by the read-only tests."""
         try:
             from network import GhostEngine
-            self.GhostEngine = GhostEngine
         except ImportError:
-            self.skipTest("GhostEngine not available")
+            raise unittest.SkipTest("GhostEngine not available")
+        cls.GhostEngine = GhostEngine
+        cls.engine = GhostEngine(username="TestUser")
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the shared engine if a test started it."""
+        if cls.engine.running:
+            cls.engine.stop()
     
     def test_engine_initialization_with_network_detector(self):
         """Test GhostEngine initializes with network detection."""
@@ -118,98 +141,88 @@ class TestGhostEngineNetworkSupport(unittest.TestCase):
     
     def test_engine_has_network_status_method(self):
         """Test GhostEngine has network status method."""
-        engine = self.GhostEngine()
-        self.assertTrue(hasattr(engine, 'get_network_status'))
+        self.assertTrue(hasattr(self.engine, 'get_network_status'))
         
         # Get network status
-        status = engine.get_network_status()
+        status = self.engine.get_network_status()
         self.assertIsInstance(status, dict)
         self.assertIn('ip', status)
         self.assertIn('type', status)
     
     def test_engine_network_monitor_method(self):
         """Test GhostEngine has network monitor worker."""
-        engine = self.GhostEngine()
-        self.assertTrue(hasattr(engine, '_network_monitor_worker'))
+        self.assertTrue(hasattr(self.engine, '_network_monitor_worker'))
     
     def test_engine_network_change_callback(self):
         """Test GhostEngine has network change callback."""
-        engine = self.GhostEngine()
-        self.assertTrue(hasattr(engine, '_on_network_changed'))
+        self.assertTrue(hasattr(self.engine, '_on_network_changed'))
 
 
 class TestChatScreenLayout(unittest.TestCase):
     """Test ChatScreen UI layout improvements."""
     
-    @patch('main.MDApp')
-    def test_chat_screen_has_keyboard_bindings(self, mock_app):
-        """Test ChatScreen has keyboard event bindings."""
+    @classmethod
+    def setUpClass(cls):
+        """Import main once; skip the whole class if it (or Kivy) is unavailable."""
         try:
-            from main import ChatScreen
-            chat = ChatScreen()
-            
-            # Check for keyboard-related methods
-            self.assertTrue(hasattr(chat, 'on_keyboard_height'))
-            self.assertTrue(hasattr(chat, 'on_keyboard_event'))
-            self.assertTrue(hasattr(chat, '_scroll_to_bottom'))
-        except ImportError:
-            self.skipTest("main.py not available")
+            import main
+        except (ImportError, SystemExit):
+            # main.py calls sys.exit() when KivyMD is missing
+            raise unittest.SkipTest("main.py not available")
+        cls.main = main
     
-    @patch('main.MDApp')
-    def test_message_bubble_adaptive_height(self, mock_app):
+    def test_chat_screen_has_keyboard_bindings(self):
+        """Test ChatScreen has keyboard event bindings."""
+        chat = self.main.ChatScreen()
+        
+        # Check for keyboard-related methods
+        self.assertTrue(hasattr(chat, 'on_keyboard_height'))
+        self.assertTrue(hasattr(chat, 'on_keyboard_event'))
+        self.assertTrue(hasattr(chat, '_scroll_to_bottom'))
+    
+    def test_message_bubble_adaptive_height(self):
         """Test MessageBubble uses adaptive height."""
-        try:
-            from main import MessageBubble
-            bubble = MessageBubble("Test message", "12:00", is_sent=True)
-            
-            # Check adaptive height property
-            self.assertTrue(bubble.adaptive_height)
-            self.assertIsNotNone(bubble.minimum_height)
-        except ImportError:
-            self.skipTest("main.py not available")
+        bubble = self.main.MessageBubble("Test message", "12:00", is_sent=True)
+        
+        # Check adaptive height property
+        self.assertTrue(bubble.adaptive_height)
+        self.assertIsNotNone(bubble.minimum_height)
     
-    @patch('main.MDApp')
-    def test_file_bubble_adaptive_height(self, mock_app):
+    def test_file_bubble_adaptive_height(self):
         """Test FileBubble uses adaptive height."""
-        try:
-            from main import FileBubble
-            bubble = FileBubble("test.txt", "/tmp/test.txt", "12:00", is_sent=False)
-            
-            # Check adaptive height property
-            self.assertTrue(bubble.adaptive_height)
-            self.assertIsNotNone(bubble.minimum_height)
-        except ImportError:
-            self.skipTest("main.py not available")
+        bubble = self.main.FileBubble("test.txt", "/tmp/test.txt", "12:00", is_sent=False)
+        
+        # Check adaptive height property
+        self.assertTrue(bubble.adaptive_height)
+        self.assertIsNotNone(bubble.minimum_height)
     
-    @patch('main.MDApp')
-    def test_radar_screen_network_badge(self, mock_app):
+    def test_radar_screen_network_badge(self):
         """Test RadarScreen has network status badge."""
-        try:
-            from main import RadarScreen
-            radar = RadarScreen()
-            
-            # Check for network badge
-            self.assertTrue(hasattr(radar, 'network_badge'))
-            self.assertTrue(hasattr(radar, 'update_network_status'))
-        except ImportError:
-            self.skipTest("main.py not available")
+        radar = self.main.RadarScreen()
+        
+        # Check for network badge
+        self.assertTrue(hasattr(radar, 'network_badge'))
+        self.assertTrue(hasattr(radar, 'update_network_status'))
 
 
 class TestResponsiveLayout(unittest.TestCase):
     """Test responsive layout on different screen sizes."""
     
+    @unittest.skip("requires a Kivy window")
     def test_small_screen_layout_480x800(self):
         """Test layout works on small screens (480x800)."""
         # This would require actual Kivy testing
         # Placeholder for integration testing
         pass
     
+    @unittest.skip("requires a Kivy window")
     def test_medium_screen_layout_720x1280(self):
         """Test layout works on medium screens (720x1280)."""
         # This would require actual Kivy testing
         # Placeholder for integration testing
         pass
     
+    @unittest.skip("requires a Kivy window")
     def test_large_screen_layout_1080x1920(self):
         """Test layout works on large screens (1080x1920)."""
         # This would require actual Kivy testing
@@ -220,18 +233,21 @@ class TestResponsiveLayout(unittest.TestCase):
 class TestNetworkSwitching(unittest.TestCase):
     """Test automatic network switching functionality."""
     
+    @unittest.skip("requires a real network change")
     def test_network_switch_wifi_to_hotspot(self):
         """Test switching from Wi-Fi to hotspot."""
         # This would require actual network setup
         # Placeholder for integration testing
         pass
     
+    @unittest.skip("requires a real network change")
     def test_network_switch_hotspot_to_cellular(self):
         """Test switching from hotspot to cellular."""
         # This would require actual network setup
         # Placeholder for integration testing
         pass
     
+    @unittest.skip("requires a real network change")
     def test_network_reconnection_on_change(self):
         """Test app reconnects when network changes."""
         # This would require actual network setup
@@ -242,48 +258,55 @@ class TestNetworkSwitching(unittest.TestCase):
 class TestBuildozerConfiguration(unittest.TestCase):
     """Test buildozer.spec configuration for Android."""
     
+    @classmethod
+    def setUpClass(cls):
+        """Read the config files once for all tests in this class."""
+        spec_path = Path('buildozer.spec')
+        req_path = Path('requirements.txt')
+        cls._spec = spec_path.read_text() if spec_path.exists() else None
+        cls._requirements = req_path.read_text() if req_path.exists() else None
+    
     def test_buildozer_spec_exists(self):
         """Test buildozer.spec file exists."""
-        spec_path = Path('buildozer.spec')
-        self.assertTrue(spec_path.exists(), "buildozer.spec not found")
+        self.assertIsNotNone(self._spec, "buildozer.spec not found")
     
     def test_buildozer_has_soft_input_mode(self):
         """Test buildozer.spec has soft input mode configured."""
-        spec_path = Path('buildozer.spec')
-        content = spec_path.read_text()
+        if self._spec is None:
+            self.skipTest("buildozer.spec not found")
         
         # Check for soft input mode configuration
-        self.assertIn('windowSoftInputMode', content)
-        self.assertIn('adjustResize', content)
+        self.assertIn('windowSoftInputMode', self._spec)
+        self.assertIn('adjustResize', self._spec)
     
     def test_requirements_has_netifaces(self):
         """Test requirements.txt includes netifaces."""
-        req_path = Path('requirements.txt')
-        content = req_path.read_text()
+        if self._requirements is None:
+            self.skipTest("requirements.txt not found")
         
-        self.assertIn('netifaces', content)
+        self.assertIn('netifaces', self._requirements)
 
 
-def run_tests():
-    """Run all tests."""
+def run_tests(verbose=False):
+    """
+    Run all tests.
+    
+    Args:
+        verbose: Print one line per test instead of dots
+    """
     loader = unittest.TestLoader()
-    suite = unittest.TestSuite()
-    
-    # Add all test classes
-    suite.addTests(loader.loadTestsFromTestCase(TestNetworkDetection))
-    suite.addTests(loader.loadTestsFromTestCase(TestGhostEngineNetworkSupport))
-    suite.addTests(loader.loadTestsFromTestCase(TestChatScreenLayout))
-    suite.addTests(loader.loadTestsFromTestCase(TestResponsiveLayout))
-    suite.addTests(loader.loadTestsFromTestCase(TestNetworkSwitching))
-    suite.addTests(loader.loadTestsFromTestCase(TestBuildozerConfiguration))
-    
-    # Run tests
-    runner = unittest.TextTestRunner(verbosity=2)
+    
+    # Every TestCase class in this module
+    suite = loader.loadTestsFromModule(sys.modules[__name__])
+    
+    # Run tests; buffer=True only replays a test's stdout if it fails
+    runner = unittest.TextTestRunner(verbosity=2 if verbose else 1,
+                                     buffer=True, failfast=False)
     result = runner.run(suite)
     
     return result.wasSuccessful()
 
 
 if __name__ == '__main__':
-    success = run_tests()
+    success = run_tests(verbose='--verbose' in sys.argv[1:])
     sys.exit(0 if success else 1)
@@ -4,75 +4,479 @@ Ghost Net APK Validator
 Automated testing script to validate APK functionality on connected Android device
 """
 
+import json
+import os
 import subprocess
 import sys
+import threading
 import time
 import re
-from datetime import datetime
+import shlex
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+# Optional: talk to the adb server directly instead of spawning an adb client per command
+try:
+    from ppadb.client import Client as AdbClient
+    PPADB_AVAILABLE = True
+except ImportError:
+    PPADB_AVAILABLE = False
+
+# Only the tags the checks look at: crashes, the app's Python output and ANRs
+LOGCAT_FILTERS = (
+    "AndroidRuntime:E",
+    "python:D",
+    "ActivityManager:W",
+    "*:S",
+)
+
+# Logcat patterns, compiled once so each check is a single pass over the buffer.
+# Case-insensitive checks match lowercased patterns against a lowercased logcat.
+IMPORT_ERROR_PATTERNS = (
+    "ImportError",
+    "ModuleNotFoundError",
+    "libtinfo5",
+    "could not find",
+    "unknown package",
+)
+NETWORK_SUCCESS_PATTERNS = (
+    "UDP socket bound",
+    "TCP server listening",
+    "threads started",
+    "App started as",
+)
+NETWORK_FAILURE_PATTERNS = (
+    "socket error",
+    "could not bind",
+    "failed to bind",
+    "address already in use",
+)
+UI_BAD_PATTERNS = (
+    "ANR",
+    "Application Not Responding",
+    "watchdog",
+    "frozen",
+)
+CRASH_PATTERNS = (
+    "FATAL EXCEPTION",
+    "RuntimeException",
+)
+
+
+def _compile_patterns(patterns):
+    """Compile literal patterns into one alternation regex"""
+    return re.compile("|".join(map(re.escape, patterns)))
+
+
+def _lowercase_patterns(patterns):
+    """Map each lowercased pattern to its original spelling, in order"""
+    return {p.lower(): p for p in patterns}
+
+
+IMPORT_ERRORS_LC = _lowercase_patterns(IMPORT_ERROR_PATTERNS)
+NETWORK_SUCCESS_LC = _lowercase_patterns(NETWORK_SUCCESS_PATTERNS)
+NETWORK_FAILURE_LC = _lowercase_patterns(NETWORK_FAILURE_PATTERNS)
+
+IMPORT_ERR_RE = _compile_patterns(IMPORT_ERRORS_LC)
+NET_OK_RE = _compile_patterns(NETWORK_SUCCESS_LC)
+NET_FAIL_RE = _compile_patterns(NETWORK_FAILURE_LC)
+UI_BAD_RE = _compile_patterns(UI_BAD_PATTERNS)  # Case-sensitive: "ANR" is an acronym
+CRASH_RE = _compile_patterns(CRASH_PATTERNS)
+# Lines showing that Python got through startup, or died trying
+LAUNCH_MARKER_RE = _compile_patterns({
+    **_lowercase_patterns(CRASH_PATTERNS), **IMPORT_ERRORS_LC,
+    **NETWORK_SUCCESS_LC, **NETWORK_FAILURE_LC,
+})
+
+# Granted entries in 'dumpsys package' output, e.g. "android.permission.INTERNET: granted=true"
+GRANTED_PERMISSION_RE = re.compile(r"android\.permission\.(\w+): granted=true")
+
+
+def _write_all(fd, data):
+    """Write all of data to a file descriptor, retrying short writes"""
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _filter_lines(text, needle):
+    """Return the lines of text containing needle, like grep"""
+    return "\n".join(line for line in text.splitlines() if needle in line)
+
+
+def _find_patterns(regex, text_lower, patterns_lc):
+    """Return the patterns matched by regex in text, in declaration order
+    
+    Args:
+        regex: Compiled alternation built from the lowercased patterns
+        text_lower: Lowercased text to scan
+        patterns_lc: Mapping of lowercased pattern to original spelling
+        
+    Returns:
+        List of matched patterns using their original spelling
+    """
+    found = {m.group(0) for m in regex.finditer(text_lower)}
+    return [name for lc, name in patterns_lc.items() if lc in found]
 
 class APKValidator:
     """Validate Ghost Net APK on Android device via ADB"""
     
+    MAX_WORKERS = 4  # Tests within a stage run concurrently, mostly waiting on adb
+    ADB_HOST = '127.0.0.1'  # adb server started by 'adb devices'
+    ADB_PORT = 5037  # Default adb server port
+    # Per-command timeouts in seconds, sized to how long each adb call can take
+    COMMAND_TIMEOUT = 10  # Default for anything not listed below
+    QUICK_TIMEOUT = 2  # devices, get-state, date, activity polling
+    PM_TIMEOUT = 5  # Combined package list and package dumpsys
+    AM_START_TIMEOUT = 5
+    LOGCAT_DUMP_TIMEOUT = 15  # A full dump can be slow on a busy device
+    PM_SEPARATOR = "---SEP---"  # Splits the combined package/permission query output
+    STDOUT_FD = 1  # Log output is written straight to the stdout descriptor
+    LAUNCH_TIMEOUT = 5.0  # Seconds to wait for the activity to reach the foreground
+    LAUNCH_POLL_INTERVAL = 0.1  # Seconds between foreground checks
+    LAUNCH_SETTLE = 5.0  # Seconds after resume to wait for a startup or crash line
+    DEVICE_CACHE_FILE = os.path.join(
+        os.path.expanduser("~"), ".cache", "ghostnet_apk_validator", "devices.json"
+    )
+    DEVICE_CACHE_TTL = 30  # Seconds a cached device id is trusted without enumeration
+    NETWORK_WAIT = 10.0  # Seconds the log checks wait for a startup/failure line in the stream
+    
     def __init__(self):
         self.test_results = {}
         self.device_id = None
-        self.log_file = f"apk_validation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+        self.device = None  # ppadb device handle when available
+        # (logcat, lowercased logcat), captured once after launch and shared by
+        # all log-based tests; replaced as a whole so readers never mix captures
+        self._capture = ("", "")
+        self.launch_ts = None  # Device clock at app launch, limits logcat to newer lines
+        # One wall-clock reading; later timestamps add cheap monotonic offsets
+        self._start_wall = datetime.now()
+        self._start_mono = time.monotonic()
+        self.log_file = f"apk_validation_{self._start_wall.strftime('%Y%m%d_%H%M%S')}.log"
+        self._log_fd = os.open(self.log_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._log_lock = threading.Lock()
+        self._package_info = None  # (packages, permissions) from one pm round-trip
+        self._package_lock = threading.Lock()
+        self._local = threading.local()  # Per-thread buffer while a test is running
+        self._stream_proc = None  # 'adb logcat' process tailing the device log
+        self._stream_lines = []
+        self._stream_done = True
+        self._stream_cv = threading.Condition()
         
     def log(self, message):
-        """Print and log message"""
-        print(message)
-        with open(self.log_file, 'a') as f:
-            f.write(f"{message}\n")
+        """Print and log message
+        
+        While a test runs on a worker thread its messages are buffered and
+        written as one block when it finishes, so concurrent tests don't
+        interleave their output.
+        """
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is not None:
+            buffer.append(message)
+            return
+        self._write_log([message])
+    
+    def _write_log(self, messages):
+        """Print and append a block of messages to the log file"""
+        # Encode the block once and hand the same bytes to both descriptors
+        data = "".join(f"{message}\n" for message in messages).encode('utf-8')
+        with self._log_lock:
+            _write_all(self.STDOUT_FD, data)
+            if self._log_fd is not None:
+                _write_all(self._log_fd, data)
+    
+    def now(self):
+        """Return the current wall-clock time derived from the monotonic clock"""
+        return self._start_wall + timedelta(seconds=time.monotonic() - self._start_mono)
     
-    def run_command(self, cmd, capture=True):
-        """Run shell command and return output"""
+    def close(self):
+        """Stop the logcat stream and close the log file"""
+        self._stop_logcat_stream()
+        with self._log_lock:
+            if self._log_fd is not None:
+                os.close(self._log_fd)
+                self._log_fd = None
+    
+    def run_command(self, cmd, capture=True, timeout=None):
+        """Run a command without a local shell and return output
+        
+        Args:
+            cmd: Argument list, e.g. ["adb", "devices"]
+            capture: Capture stdout/stderr instead of inheriting them
+            timeout: Seconds before giving up (default COMMAND_TIMEOUT)
+            
+        Returns:
+            Tuple of (returncode, stdout, stderr)
+        """
+        if timeout is None:
+            timeout = self.COMMAND_TIMEOUT
         try:
             if capture:
-                result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=10)
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
                 return result.returncode, result.stdout, result.stderr
             else:
-                subprocess.run(cmd, shell=True, timeout=10)
+                subprocess.run(cmd, timeout=timeout)
                 return 0, "", ""
         except subprocess.TimeoutExpired:
             return 1, "", "Command timed out"
         except Exception as e:
             return 1, "", str(e)
     
+    def adb_shell(self, command, timeout=None):
+        """Run a command in the device shell
+        
+        Uses the ppadb device handle when connected, which avoids starting a
+        new adb client process for every command; otherwise falls back to
+        the adb CLI.
+        
+        Args:
+            command: Shell command line to run on the device
+            timeout: Seconds before giving up (default COMMAND_TIMEOUT)
+            
+        Returns:
+            Tuple of (returncode, stdout, stderr)
+        """
+        if timeout is None:
+            timeout = self.COMMAND_TIMEOUT
+        if self.device is None:
+            return self.run_command(["adb", "shell", command], timeout=timeout)
+        
+        try:
+            output = self.device.shell(command, timeout=timeout)
+            return 0, output or "", ""
+        except Exception as e:
+            return 1, "", str(e)
+    
+    def _connect_adb_client(self):
+        """Attach a ppadb handle for the selected device if possible"""
+        if not PPADB_AVAILABLE or not self.device_id:
+            return
+        try:
+            client = AdbClient(host=self.ADB_HOST, port=self.ADB_PORT)
+            self.device = client.device(self.device_id)
+        except Exception as e:
+            self.log(f"⚠️ ppadb unavailable, using adb CLI: {e}")
+            self.device = None
+    
+    def _get_logcat(self, refresh=False):
+        """Return the cached logcat dump, capturing it on first use
+        
+        Args:
+            refresh: Re-read the device log buffer even if already cached
+            
+        Returns:
+            Tuple of (logcat, lowercased logcat); empty strings if the capture failed
+        """
+        if refresh or not self._capture[0]:
+            if self._stream_proc is not None:
+                self._set_logcat(self._stream_snapshot())
+                return self._capture
+            filters = " ".join(map(shlex.quote, LOGCAT_FILTERS))
+            if self.launch_ts:
+                cmd = f"logcat -d -v brief -t '{self.launch_ts}' {filters}"
+            else:
+                cmd = f"logcat -d -v brief {filters}"
+            code, output, error = self.adb_shell(cmd, timeout=self.LOGCAT_DUMP_TIMEOUT)
+            self._set_logcat(output)
+        return self._capture
+    
+    def _set_logcat(self, output):
+        """Publish a capture and its lowercased copy in a single assignment"""
+        self._capture = (output, output.lower())
+    
+    def _get_package_info(self):
+        """Query installed packages and app permissions in one adb call
+        
+        The installation and permission tests run concurrently, so the
+        first caller performs the query and the other reuses its result.
+        
+        Returns:
+            Tuple of (package_list_output, granted_permission_names)
+        """
+        with self._package_lock:
+            if self._package_info is None:
+                # 'dumpsys package' is far smaller than 'pm dump' for one package
+                code, output, error = self.adb_shell(
+                    f"pm list packages; echo {self.PM_SEPARATOR}; "
+                    "dumpsys package org.ghostnet.ghostnet",
+                    timeout=self.PM_TIMEOUT,
+                )
+                packages, _, package_dump = output.partition(self.PM_SEPARATOR)
+                # Filter here rather than piping through grep
+                self._package_info = (
+                    _filter_lines(packages, "ghostnet"),
+                    set(GRANTED_PERMISSION_RE.findall(package_dump)),
+                )
+            return self._package_info
+    
+    def _start_logcat_stream(self):
+        """Start tailing the device log on a background reader thread
+        
+        Log checks then see lines as they are emitted instead of dumping
+        the whole buffer, and can wait for a specific line to appear.
+        """
+        try:
+            proc = subprocess.Popen(
+                ["adb", "logcat", "-v", "brief", *LOGCAT_FILTERS],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                errors='replace',
+                bufsize=1,
+            )
+        except OSError as e:
+            self.log(f"⚠️ Could not stream logcat, falling back to dumps: {e}")
+            return
+        
+        with self._stream_cv:
+            self._stream_proc = proc
+            self._stream_lines = []
+            self._stream_done = False
+        reader = threading.Thread(target=self._read_logcat_stream, args=(proc,), daemon=True)
+        reader.start()
+    
+    def _read_logcat_stream(self, proc):
+        """Collect streamed logcat lines until the process exits"""
+        for line in iter(proc.stdout.readline, ''):
+            with self._stream_cv:
+                self._stream_lines.append(line)
+                self._stream_cv.notify_all()
+        with self._stream_cv:
+            self._stream_done = True
+            self._stream_cv.notify_all()
+    
+    def _stream_snapshot(self):
+        """Return all lines streamed so far as one string"""
+        with self._stream_cv:
+            return "".join(self._stream_lines)
+    
+    def _wait_for_log(self, regex, timeout):
+        """Wait until a streamed line matches regex
+        
+        Args:
+            regex: Compiled pattern, matched against lowercased lines
+            timeout: Maximum seconds to wait
+            
+        Returns:
+            True if a matching line was seen, False on timeout or no stream
+        """
+        deadline = time.monotonic() + timeout
+        index = 0
+        with self._stream_cv:
+            while True:
+                for line in self._stream_lines[index:]:
+                    if regex.search(line.lower()):
+                        return True
+                index = len(self._stream_lines)
+                remaining = deadline - time.monotonic()
+                if self._stream_done or remaining <= 0:
+                    return False
+                self._stream_cv.wait(remaining)
+    
+    def _stop_logcat_stream(self):
+        """Terminate the logcat stream if it is running"""
+        proc = self._stream_proc
+        if proc is None:
+            return
+        proc.terminate()
+        try:
+            proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    
+    def _get_device_time(self):
+        """Read the device clock in logcat's -t timestamp format
+        
+        Returns:
+            Timestamp string such as '06-01 12:34:56.000', or None on failure
+        """
+        code, output, error = self.adb_shell("date '+%m-%d %H:%M:%S.000'", timeout=self.QUICK_TIMEOUT)
+        timestamp = output.strip()
+        if code != 0 or not timestamp:
+            return None
+        return timestamp
+    
     def test_adb_connection(self):
         """Test ADB connection to device"""
         self.log("\n" + "="*60)
         self.log("TEST 1: ADB Connection")
         self.log("="*60)
         
-        code, output, error = self.run_command("adb devices")
-        
-        if code != 0:
-            self.log("❌ ADB not found or error occurred")
-            self.log(f"Error: {error}")
-            return False
-        
-        lines = output.strip().split('\n')[1:]  # Skip header
-        devices = [line.split('\t')[0] for line in lines if 'device' in line and not 'offline' in line]
+        device_id = self._load_cached_device()
         
-        if not devices:
-            self.log("❌ No Android devices connected")
-            self.log("Please connect device with USB debugging enabled")
-            return False
+        if device_id:
+            self.log(f"Using cached device (still online): {device_id}")
+        else:
+            code, output, error = self.run_command(["adb", "devices"], timeout=self.QUICK_TIMEOUT)
+            
+            if code != 0:
+                self.log("❌ ADB not found or error occurred")
+                self.log(f"Error: {error}")
+                return False
+            
+            lines = output.strip().split('\n')[1:]  # Skip header
+            # Only the first online device is used, so stop at the first match
+            device_id = next(
+                (line.split('\t')[0] for line in lines if 'device' in line and not 'offline' in line),
+                None,
+            )
+            
+            if not device_id:
+                self.log("❌ No Android devices connected")
+                self.log("Please connect device with USB debugging enabled")
+                return False
+            
+            self._save_cached_device(device_id)
         
-        self.device_id = devices[0]
+        self.device_id = device_id
+        self._connect_adb_client()
         self.log(f"✅ Device connected: {self.device_id}")
         self.test_results['adb_connection'] = True
         return True
     
+    def _load_cached_device(self):
+        """Return the cached device id if it is recent and still online
+        
+        Returns:
+            Device serial, or None if enumeration is needed
+        """
+        try:
+            with open(self.DEVICE_CACHE_FILE, 'r') as f:
+                cache = json.load(f)
+            device_id = cache.get("device_id")
+            if not device_id or time.time() - cache.get("ts", 0) >= self.DEVICE_CACHE_TTL:
+                return None
+        except (OSError, ValueError, AttributeError):
+            return None
+        
+        code, output, error = self.run_command(
+            ["adb", "-s", device_id, "get-state"], timeout=self.QUICK_TIMEOUT
+        )
+        if code != 0 or output.strip() != "device":
+            return None
+        return device_id
+    
+    def _save_cached_device(self, device_id):
+        """Record the selected device id for later runs"""
+        try:
+            os.makedirs(os.path.dirname(self.DEVICE_CACHE_FILE), exist_ok=True)
+            with open(self.DEVICE_CACHE_FILE, 'w') as f:
+                json.dump({"ts": time.time(), "device_id": device_id}, f)
+        except OSError as e:
+            self.log(f"⚠️ Could not write device cache: {e}")
+    
     def test_app_installed(self):
         """Test if Ghost Net app is installed"""
         self.log("\n" + "="*60)
         self.log("TEST 2: App Installation Check")
         self.log("="*60)
         
-        code, output, error = self.run_command("adb shell pm list packages | grep ghostnet")
+        packages, _ = self._get_package_info()
         
-        if code != 0 or "ghostnet" not in output:
+        if "ghostnet" not in packages:
             self.log("❌ Ghost Net app not installed")
             self.log("Install with: adb install bin/ghostnet-*-debug.apk")
             self.test_results['app_installed'] = False
@@ -89,20 +493,41 @@ class APKValidator:
         self.log("="*60)
         
         # Clear logcat
-        self.run_command("adb logcat -c")
+        self.adb_shell("logcat -c")
         time.sleep(1)
         
+        # Remember when the app started so logcat only returns newer lines
+        self.launch_ts = self._get_device_time()
+        
+        # Tail the log from here on so later checks can wait for new lines
+        self._start_logcat_stream()
+        
         # Start app
         self.log("Launching Ghost Net app...")
-        self.run_command("adb shell am start -n org.ghostnet.ghostnet/org.kivy.android.PythonActivity")
+        self.adb_shell(
+            "am start -n org.ghostnet.ghostnet/org.kivy.android.PythonActivity",
+            timeout=self.AM_START_TIMEOUT,
+        )
         
         # Wait for app to start
-        time.sleep(5)
+        elapsed = self._wait_for_launch()
+        if elapsed is None:
+            self.log(f"⚠️ App not in foreground after {self.LAUNCH_TIMEOUT:.0f}s")
+        else:
+            self.log(f"App in foreground after {elapsed:.1f}s")
+        
+        # p4a resumes PythonActivity before Python has imported anything, so
+        # a resumed activity only starts the wait for startup (or a crash)
+        if self._stream_proc is not None:
+            if not self._wait_for_log(LAUNCH_MARKER_RE, self.LAUNCH_SETTLE):
+                self.log(f"No startup line after {self.LAUNCH_SETTLE:.0f}s, checking log anyway")
+        else:
+            time.sleep(self.LAUNCH_SETTLE)
         
-        # Check for crashes in logcat
-        code, logcat, error = self.run_command("adb logcat -d")
+        # Capture logcat once; later tests scan this cached copy
+        logcat, _ = self._get_logcat(refresh=True)
         
-        if "FATAL EXCEPTION" in logcat or "RuntimeException" in logcat:
+        if CRASH_RE.search(logcat):
             self.log("❌ App crashed on launch")
             self.log(f"Crash log:\n{logcat[-500:]}")  # Last 500 chars
             self.test_results['app_launch'] = False
@@ -112,34 +537,38 @@ class APKValidator:
         self.test_results['app_launch'] = True
         return True
     
+    def _wait_for_launch(self):
+        """Poll until the Ghost Net activity is resumed
+        
+        Returns:
+            Seconds waited, or None if LAUNCH_TIMEOUT elapsed first
+        """
+        start = time.monotonic()
+        deadline = start + self.LAUNCH_TIMEOUT
+        while time.monotonic() < deadline:
+            code, output, error = self.adb_shell("dumpsys activity activities", timeout=self.QUICK_TIMEOUT)
+            for line in output.splitlines():
+                if 'ResumedActivity' in line and 'org.ghostnet.ghostnet' in line:
+                    return time.monotonic() - start
+            time.sleep(self.LAUNCH_POLL_INTERVAL)
+        return None
+    
     def test_no_import_errors(self):
         """Test for import/module errors in logcat"""
         self.log("\n" + "="*60)
         self.log("TEST 4: Import Errors Check")
         self.log("="*60)
         
-        code, logcat, error = self.run_command("adb logcat -d")
-        
-        error_patterns = [
-            "ImportError",
-            "ModuleNotFoundError",
-            "libtinfo5",
-            "could not find",
-            "unknown package"
-        ]
+        logcat, logcat_lower = self._get_logcat()
         
-        found_errors = []
-        for pattern in error_patterns:
-            if pattern.lower() in logcat.lower():
-                found_errors.append(pattern)
+        found_errors = _find_patterns(IMPORT_ERR_RE, logcat_lower, IMPORT_ERRORS_LC)
         
         if found_errors:
             self.log(f"❌ Found import/module errors: {', '.join(found_errors)}")
             self.log("\nRelevant log lines:")
             for line in logcat.split('\n'):
-                for pattern in error_patterns:
-                    if pattern.lower() in line.lower():
-                        self.log(f"  {line}")
+                if IMPORT_ERR_RE.search(line.lower()):
+                    self.log(f"  {line}")
             self.test_results['no_import_errors'] = False
             return False
         
@@ -153,33 +582,10 @@ class APKValidator:
         self.log("TEST 5: Network Engine Startup")
         self.log("="*60)
         
-        code, logcat, error = self.run_command("adb logcat -d")
-        
-        # Look for successful startup indicators
-        success_indicators = [
-            "UDP socket bound",
-            "TCP server listening",
-            "threads started",
-            "App started as"
-        ]
-        
-        found_indicators = []
-        for indicator in success_indicators:
-            if indicator.lower() in logcat.lower():
-                found_indicators.append(indicator)
-        
-        # Look for failure indicators
-        failure_indicators = [
-            "socket error",
-            "could not bind",
-            "failed to bind",
-            "address already in use"
-        ]
+        _, logcat_lower = self._get_logcat()
         
-        found_failures = []
-        for failure in failure_indicators:
-            if failure.lower() in logcat.lower():
-                found_failures.append(failure)
+        # Look for failure indicators; these decide the result on their own
+        found_failures = _find_patterns(NET_FAIL_RE, logcat_lower, NETWORK_FAILURE_LC)
         
         if found_failures:
             self.log(f"⚠️ Network issues detected: {', '.join(found_failures)}")
@@ -187,6 +593,9 @@ class APKValidator:
             self.test_results['network_engine'] = 'partial'
             return True  # Don't fail completely
         
+        # Look for successful startup indicators
+        found_indicators = _find_patterns(NET_OK_RE, logcat_lower, NETWORK_SUCCESS_LC)
+        
         if found_indicators:
             self.log(f"✅ Network engine started successfully")
             self.log(f"   Found: {', '.join(found_indicators)}")
@@ -204,7 +613,7 @@ class APKValidator:
         self.log("TEST 6: Permissions Check")
         self.log("="*60)
         
-        code, output, error = self.run_command("adb shell pm dump org.ghostnet.ghostnet | grep permissions")
+        _, granted = self._get_package_info()
         
         required_perms = [
             "INTERNET",
@@ -214,10 +623,7 @@ class APKValidator:
             "READ_EXTERNAL_STORAGE"
         ]
         
-        granted_perms = []
-        for perm in required_perms:
-            if perm in output:
-                granted_perms.append(perm)
+        granted_perms = [perm for perm in required_perms if perm in granted]
         
         if len(granted_perms) >= 3:  # At least 3 permissions
             self.log(f"✅ Permissions granted: {len(granted_perms)}/{len(required_perms)}")
@@ -238,16 +644,9 @@ class APKValidator:
         self.log("="*60)
         
         self.log("Checking for frozen/unresponsive indicators...")
-        code, logcat, error = self.run_command("adb logcat -d")
-        
-        bad_signs = [
-            "ANR",
-            "Application Not Responding",
-            "watchdog",
-            "frozen"
-        ]
+        logcat, _ = self._get_logcat()
         
-        if any(sign in logcat for sign in bad_signs):
+        if UI_BAD_RE.search(logcat):
             self.log("⚠️ Possible UI responsiveness issues detected")
             self.test_results['ui_responsive'] = False
             return False
@@ -262,10 +661,9 @@ class APKValidator:
         self.log("📊 VALIDATION REPORT")
         self.log("="*60)
         
-        passed = sum(1 for v in self.test_results.values() if v is True)
-        failed = sum(1 for v in self.test_results.values() if v is False)
-        partial = sum(1 for v in self.test_results.values() if v == 'partial')
-        unknown = sum(1 for v in self.test_results.values() if v == 'unknown')
+        counts = Counter(self.test_results.values())
+        passed, failed = counts[True], counts[False]
+        partial, unknown = counts['partial'], counts['unknown']
         
         total = len(self.test_results)
         
@@ -303,6 +701,8 @@ class APKValidator:
             overall = False
         
         self.log("="*60)
+        elapsed = time.monotonic() - self._start_mono
+        self.log(f"Finished: {self.now().strftime('%Y-%m-%d %H:%M:%S')} ({elapsed:.1f}s)")
         self.log(f"\n📝 Full log saved to: {self.log_file}")
         
         return overall
@@ -312,36 +712,67 @@ class APKValidator:
         self.log("\n" + "="*60)
         self.log("👻 GHOST NET APK VALIDATOR")
         self.log("="*60)
-        self.log(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        self.log(f"Started: {self._start_wall.strftime('%Y-%m-%d %H:%M:%S')}")
         self.log(f"Log file: {self.log_file}")
         
-        # Run tests
-        tests = [
-            ("ADB Connection", self.test_adb_connection),
+        # Run tests in dependency order; tests within a stage are independent
+        device_checks = [
             ("App Installed", self.test_app_installed),
-            ("App Launch", self.test_app_launch),
+            ("Permissions", self.test_permissions),
+        ]
+        log_checks = [
             ("No Import Errors", self.test_no_import_errors),
             ("Network Engine", self.test_network_engine),
-            ("Permissions", self.test_permissions),
             ("UI Responsiveness", self.test_ui_responsiveness),
         ]
         
-        for test_name, test_func in tests:
-            try:
-                test_func()
-            except Exception as e:
-                self.log(f"❌ Test '{test_name}' crashed: {e}")
-                self.test_results[test_name.lower().replace(' ', '_')] = False
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            self._run_stage(executor, [("ADB Connection", self.test_adb_connection)])
+            self._run_stage(executor, device_checks)
+            # Launching mutates device state, so it runs on its own
+            self._run_stage(executor, [("App Launch", self.test_app_launch)])
+            # Give the app time to log its startup, then capture once so
+            # every log check scans the same, current copy
+            self._wait_for_log(LAUNCH_MARKER_RE, self.NETWORK_WAIT)
+            self._get_logcat(refresh=self._stream_proc is not None)
+            self._run_stage(executor, log_checks)
+        self._stop_logcat_stream()
         
         # Generate report
         success = self.generate_report()
         return success
+    
+    def _run_stage(self, executor, tests):
+        """Run a group of independent tests concurrently and wait for all
+        
+        Args:
+            executor: ThreadPoolExecutor to submit tests to
+            tests: List of (test_name, test_func) tuples
+        """
+        futures = [executor.submit(self._run_test, name, func) for name, func in tests]
+        for future in as_completed(futures):
+            future.result()
+    
+    def _run_test(self, test_name, test_func):
+        """Run one test, buffering its log output and recording crashes"""
+        self._local.buffer = []
+        try:
+            test_func()
+        except Exception as e:
+            self.log(f"❌ Test '{test_name}' crashed: {e}")
+            self.test_results[test_name.lower().replace(' ', '_')] = False
+        finally:
+            messages, self._local.buffer = self._local.buffer, None
+            self._write_log(messages)
 
 
 def main():
     """Main entry point"""
     validator = APKValidator()
-    success = validator.run_all_tests()
+    try:
+        success = validator.run_all_tests()
+    finally:
+        validator.close()
     return 0 if success else 1
 
 